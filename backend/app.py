@@ -2,20 +2,26 @@ import os
 import traceback
 import numpy as np
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, send_file
 from pinecone import Pinecone
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from boto3.dynamodb.conditions import Attr
 from flask_cors import CORS  
+from werkzeug.middleware.proxy_fix import ProxyFix
 from pypdf import PdfReader
 import os
 import re
 import json
+import gzip
+import time
+import threading
 import boto3
 import jwt
 import datetime
 import hashlib
+import random
+import hmac
 from botocore.exceptions import ClientError
+from urllib.parse import quote
 import requests
 from openai import OpenAI
 import uuid
@@ -26,6 +32,17 @@ import vertexai
 from vertexai.generative_models import GenerativeModel
 from boto3.dynamodb.conditions import Key, Attr
 from rouge import Rouge
+from concurrent.futures import ThreadPoolExecutor
+from vector_store import QuantizedVectorStore
+from chunk_store import ChunkStore
+from ingest import ingest_paper
+from llm_limits import SingleFlight, ProviderLimiter, ProviderBusyError, Hedger
+from vector_upsert import ParallelUpserter
+from paper_cache import PaperCache, PaperWorkingSet
+from paper_namespaces import NamespaceDirectory, paper_namespace
+from title_index import TitleIndex
+from profiling import SamplingProfiler, ProfileStore
+from scheduler import FairScheduler, INTERACTIVE_WORK, BATCH_WORK, INGESTION_WORK
 
 # Ensure fallback for unsupported operations on MPS
 os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
@@ -35,15 +52,67 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
+AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "research-llm-pdfs")
 TABLE_NAME = os.getenv("TABLE_NAME")
 TOKEN = os.getenv("TOKEN")
 LLAMA_URL = os.getenv("LLAMA_URL")
 BACKEND_DOMAIN = os.getenv("BACKEND_DOMAIN")
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH")
+LOCAL_VECTOR_STORE_MODE = os.getenv("LOCAL_VECTOR_STORE_MODE", "float32")
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH")
+CHUNK_STORE_MAX_OPEN = int(os.getenv("CHUNK_STORE_MAX_OPEN", "256"))
+LLAMA_MAX_CONCURRENCY = int(os.getenv("LLAMA_MAX_CONCURRENCY", "4"))
+TOGETHER_MAX_CONCURRENCY = int(os.getenv("TOGETHER_MAX_CONCURRENCY", "16"))
+VERTEX_MAX_CONCURRENCY = int(os.getenv("VERTEX_MAX_CONCURRENCY", "16"))
+PROVIDER_MAX_QUEUE = int(os.getenv("PROVIDER_MAX_QUEUE", "64"))
+PROVIDER_QUEUE_TIMEOUT = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "30"))
+LLAMA_TIMEOUT = float(os.getenv("LLAMA_TIMEOUT", "120"))
+LLAMA_HEDGE_BACKUP = os.getenv("LLAMA_HEDGE_BACKUP", "llama3.3")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "4"))
+LLM_SCHEDULER_SLOTS = int(os.getenv("LLM_SCHEDULER_SLOTS", "24"))
+EMBEDDING_SCHEDULER_SLOTS = int(os.getenv("EMBEDDING_SCHEDULER_SLOTS", "16"))
+INGESTION_MAX_SLOTS = int(os.getenv("INGESTION_MAX_SLOTS", "4"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "256"))
+SCHEDULER_TIMEOUT = float(os.getenv("SCHEDULER_TIMEOUT", "60"))
+UPSERT_MAX_IN_FLIGHT = int(os.getenv("UPSERT_MAX_IN_FLIGHT", "4"))
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PAPER_CACHE_IDLE_SECONDS = float(os.getenv("PAPER_CACHE_IDLE_SECONDS", "1800"))
+CORPUS_NAMESPACE = os.getenv("CORPUS_NAMESPACE", "")
+TITLE_INDEX_PATH = os.getenv("TITLE_INDEX_PATH", "pdf_metadata.json")
+TITLE_INDEX_REFRESH_SECONDS = float(os.getenv("TITLE_INDEX_REFRESH_SECONDS", "60"))
+MAX_TITLE_RESULTS = 50
+# Proxies in front of the backend that append to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
 SALT = "A VERY STRONG SALT"
 SECRET="A VERY SECURE SECRET"
 USER_TABLE_NAME = 'research_user_table'
+PAPER_HASH_TABLE_NAME = 'research_paper_hash_table'
+SUMMARY_CACHE_TABLE_NAME = 'research_summary_cache_table'
+SUMMARY_MODEL = "gemini-1.5-flash-002"
+# Vertex models /getSummary may run; anything else is rejected
+SUMMARY_MODELS = {SUMMARY_MODEL, *filter(None, os.getenv("SUMMARY_EXTRA_MODELS", "").split(","))}
+SUMMARY_PROMPT = "\nPaper: {text}\n\nProvide a detailed summary based on the given paper, Give plain text avoid markdown don't give any extra information out of the scope of the given paper.\n"
+QUERY_FIELDS = ("answer", "papers", "snippets", "chunks")
+SNIPPET_LENGTH = 200
+MAX_SNIPPET_LENGTH = 4000
+NO_MATCHES_ANSWER = "No relevant matches found in the database."
+# Candidates ranked in phase one (ids and scores only), to find distinct papers
+QUERY_CANDIDATES = 30
+CONTEXT_CHUNKS = 3
+COMPRESSION_MIN_BYTES = 1024
+MAX_BATCH_QUERIES = 256
+MAX_TOP_K = 100
+BATCH_SEARCH_CONCURRENCY = 8
+MAX_BATCH_ANSWER_CONCURRENCY = 8
+SECTIONS_PROMPT = "\nPaper: {text}\n\nPlease give the Abstract, Introdution and the conclusion from the paper. Give those sections as is. Give plain text avoid markdown don't give any extra information out of the scope of the given paper.\n"
 
 
 
@@ -72,14 +141,137 @@ QUEUE_URL = 'https://sqs.us-west-2.amazonaws.com/992382724291/UserEmailQueue'
 
 pc = Pinecone(api_key=PINECONE_KEY)
 index = pc.Index(PINECONE_INDEX_NAME)
+# Uploaded papers each have their own namespace; the corpus shares CORPUS_NAMESPACE
+paper_namespaces = NamespaceDirectory(index)
+
+# Optional local search path, built with build_vector_store.py
+local_store = None
+if LOCAL_VECTOR_STORE_PATH:
+    local_store = QuantizedVectorStore.load(LOCAL_VECTOR_STORE_PATH, LOCAL_VECTOR_STORE_MODE)
+    print(f"Loaded local vector store: {len(local_store.ids)} vectors, mode {LOCAL_VECTOR_STORE_MODE}")
+
+# Chunk bodies live here; vector metadata only carries their offsets. The
+# store is the only copy of the text, so it must be on persistent storage
+# shared by every replica.
+if not CHUNK_STORE_PATH:
+    raise RuntimeError("CHUNK_STORE_PATH must be set to a persistent directory shared by all backend instances")
+chunk_store = ChunkStore(CHUNK_STORE_PATH, max_open=CHUNK_STORE_MAX_OPEN)
+
+# Title search over the corpus metadata, extended as papers are uploaded
+title_index = TitleIndex()
+try:
+    title_index = TitleIndex.from_metadata_file(TITLE_INDEX_PATH)
+    print(f"Loaded title index: {len(title_index)} papers")
+except (OSError, ValueError) as e:
+    print(f"Title index not loaded from {TITLE_INDEX_PATH}: {e}")
+
+# Working sets of the papers queried from the notebook page; 0 disables it
+paper_cache = None
+if PAPER_CACHE_MAX_BYTES > 0:
+    paper_cache = PaperCache(lambda paper_id: load_paper_working_set(paper_id),
+                             PAPER_CACHE_MAX_BYTES, PAPER_CACHE_IDLE_SECONDS)
+
+# Admission control per LLM provider, keyed by the model type of generate_answer
+provider_limiters = {
+    "llama3.2": ProviderLimiter("llama3.2", LLAMA_MAX_CONCURRENCY, PROVIDER_MAX_QUEUE, PROVIDER_QUEUE_TIMEOUT),
+    "llama3.3": ProviderLimiter("llama3.3", TOGETHER_MAX_CONCURRENCY, PROVIDER_MAX_QUEUE, PROVIDER_QUEUE_TIMEOUT),
+    "gemini1.5": ProviderLimiter("gemini1.5", VERTEX_MAX_CONCURRENCY, PROVIDER_MAX_QUEUE, PROVIDER_QUEUE_TIMEOUT),
+}
+answer_single_flight = SingleFlight()
+# The self-hosted llama3.2 has multi-second cold starts, so it is hedged by default
+answer_hedger = Hedger(
+    {"llama3.2": LLAMA_HEDGE_BACKUP} if LLAMA_HEDGE_BACKUP else {},
+    percentile=HEDGE_PERCENTILE,
+    default_delay=HEDGE_DEFAULT_DELAY
+)
+
+# Interactive /query work is scheduled ahead of batch jobs and ingestion by
+# /summarize, users share each class fairly, and ingestion is capped so it
+# can never hold every slot
+scheduler_caps = {INGESTION_WORK: INGESTION_MAX_SLOTS}
+llm_scheduler = FairScheduler("llm", LLM_SCHEDULER_SLOTS, caps=scheduler_caps,
+                              max_queue=SCHEDULER_MAX_QUEUE, timeout=SCHEDULER_TIMEOUT)
+embedding_scheduler = FairScheduler("embedding", EMBEDDING_SCHEDULER_SLOTS, caps=scheduler_caps,
+                                    max_queue=SCHEDULER_MAX_QUEUE, timeout=SCHEDULER_TIMEOUT)
 
 openAIClient = OpenAI(api_key=OPENAI_API_KEY,)
 client = Together(api_key=TOGETHER_API_KEY)
 
 # Initialize Flask app
 app = Flask(__name__)
+if TRUSTED_PROXY_HOPS:
+    # remote_addr becomes the address appended by the nearest trusted proxy,
+    # never one the client wrote into X-Forwarded-For itself
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
 CORS(app)
 
+# Opt-in request profiling: a request is sampled when it sends
+# "X-Profile: <PROFILE_TOKEN>", or at random with PROFILE_SAMPLE_RATE.
+# Everything else only pays for the header check.
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES) if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0 else None
+
+def has_profile_token():
+    header = request.headers.get("X-Profile", "")
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(header.encode(), PROFILE_TOKEN.encode())
+
+@app.before_request
+def start_profiler():
+    if profile_store is None or request.path.startswith("/profiles"):
+        return
+    if has_profile_token() or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        g.profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL).start()
+
+def finish_profiler():
+    """
+    Stops the request's profiler, if any, and saves its collapsed stacks.
+    Returns:
+        str: The saved profile name, or None.
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return None
+    profiler.stop()
+    label = f"{request.method}-{request.path}-{int(profiler.duration * 1000)}ms"
+    try:
+        return profile_store.save(label, profiler.collapsed())
+    except OSError as e:
+        print(f"Could not save profile: {e}")
+        return None
+
+@app.after_request
+def save_profile(response):
+    name = finish_profiler()
+    if name:
+        response.headers["X-Profile-Id"] = name
+    return response
+
+@app.teardown_request
+def discard_profiler(error=None):
+    # Requests that raised past after_request still stop their sampler
+    finish_profiler()
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Lists the saved request profiles, newest first. Requires X-Profile.
+    """
+    if profile_store is None or not has_profile_token():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"profiles": profile_store.list()}), 200
+
+@app.route('/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """
+    Downloads one profile in collapsed-stack format, for flamegraph.pl or
+    speedscope. Requires X-Profile.
+    """
+    if profile_store is None or not has_profile_token():
+        return jsonify({"error": "Forbidden"}), 403
+    path = profile_store.path_for(name)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype="text/plain", as_attachment=True, download_name=name)
+
 @app.route('/register', methods=['POST'])
 def register():
     """
@@ -179,24 +371,20 @@ def login():
 
 
 
-# Split text into manageable chunks
-def split_text_with_langchain(text, chunk_size=4000, chunk_overlap=500):
+# Chunk sizes are in tokens of the embedding model
+CHUNK_TOKENS = 1000
+CHUNK_OVERLAP_TOKENS = 125
+INGEST_EMBED_BATCH_SIZE = 64
+
+def iter_pdf_pages(pdf_file):
     """
-    Splits the text into manageable chunks using LangChain's RecursiveCharacterTextSplitter.
+    Yields the extracted text of each page of a PDF, one page at a time.
     Args:
-        text (str): The text to split.
-        chunk_size (int): Maximum size of each chunk in tokens.
-        chunk_overlap (int): Number of overlapping characters between chunks.
-    Returns:
-        List of text chunks.
+        pdf_file (FileStorage): The uploaded PDF file from the request.
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    chunks = text_splitter.split_text(text)
-    return chunks
+    reader = PdfReader(pdf_file)
+    for page in reader.pages:
+        yield page.extract_text() or ""
 
 def parse_pdf_to_text(pdf_file):
     """
@@ -206,13 +394,7 @@ def parse_pdf_to_text(pdf_file):
     Returns:
         str: Extracted text from the PDF.
     """
-    reader = PdfReader(pdf_file)
-    number_of_pages = len(reader.pages)
-    text = ""
-    for i in range(number_of_pages):
-        page = reader.pages[i]
-        text += page.extract_text()
-    return text
+    return "".join(iter_pdf_pages(pdf_file))
 
 def clean_filename(filename):
     """
@@ -224,50 +406,320 @@ def clean_filename(filename):
     """
     return re.sub(r'[^A-Za-z0-9]', '_', os.path.splitext(filename)[0])
 
-def save_text_to_temp_file(text, folder_path, original_filename):
+def hash_pdf_file(pdf_file, block_size=1 << 20):
+    """
+    Computes a SHA-256 fingerprint of the uploaded PDF's content.
+    Args:
+        pdf_file (FileStorage): The uploaded PDF file from the request.
+        block_size (int): Number of bytes read per iteration.
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    pdf_file.stream.seek(0)
+    for block in iter(lambda: pdf_file.stream.read(block_size), b""):
+        digest.update(block)
+    # Rewind so S3 upload and parsing see the whole file
+    pdf_file.stream.seek(0)
+    return digest.hexdigest()
+
+def get_paper_by_hash(content_hash):
+    """
+    Looks up a previously ingested paper by its content hash.
+    Args:
+        content_hash (str): SHA-256 hex digest of the PDF content.
+    Returns:
+        dict: The stored hash record (PaperID, summary, ...) or None if unknown.
+    """
+    table = dynamodb.Table(PAPER_HASH_TABLE_NAME)
+    response = table.get_item(Key={'content_hash': content_hash})
+    return response.get('Item')
+
+def save_paper_hash(content_hash, paper_id):
+    """
+    Records the PaperID allocated to a content hash, unless a concurrent
+    upload of the same content recorded its own PaperID first.
+    Args:
+        content_hash (str): SHA-256 hex digest of the PDF content.
+        paper_id (int): PaperID allocated to the content.
+    Returns:
+        int: The PaperID stored for the hash, which differs from paper_id if
+            another upload won.
+    """
+    table = dynamodb.Table(PAPER_HASH_TABLE_NAME)
+    try:
+        table.put_item(Item={'content_hash': content_hash, 'PaperID': int(paper_id)},
+                       ConditionExpression="attribute_not_exists(content_hash)")
+        return int(paper_id)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return int(get_paper_by_hash(content_hash)['PaperID'])
+
+def release_paper_hash(content_hash, paper_id):
+    """
+    Removes a hash record written by save_paper_hash, if it still points at
+    paper_id, after the upload that wrote it failed.
+    """
+    table = dynamodb.Table(PAPER_HASH_TABLE_NAME)
+    try:
+        table.delete_item(Key={'content_hash': content_hash},
+                          ConditionExpression="PaperID = :paper_id",
+                          ExpressionAttributeValues={':paper_id': int(paper_id)})
+    except ClientError as e:
+        print(f"Could not release hash of paper {paper_id}: {e.response['Error']['Message']}")
+
+def get_prompt_version(prompt):
+    """
+    Derives a short version tag from a prompt template so that editing the
+    prompt invalidates every generation cached with the old wording.
+    """
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+
+def get_generation_cache_key(kind, model_name, prompt):
+    return f"{kind}#{model_name}#{get_prompt_version(prompt)}"
+
+def get_cached_generation(paper_id, kind, model_name=SUMMARY_MODEL, prompt=SUMMARY_PROMPT):
+    """
+    Reads a stored LLM generation (summary or extracted sections) for a paper.
+    Args:
+        paper_id (int): PaperID of the paper.
+        kind (str): Type of generation, "summary" or "sections".
+        model_name (str): Model that produced the generation.
+        prompt (str): Prompt template used for the generation.
+    Returns:
+        str: The cached text, or None on a cache miss.
+    """
+    table = dynamodb.Table(SUMMARY_CACHE_TABLE_NAME)
+    response = table.get_item(Key={
+        'PaperID': int(paper_id),
+        'cache_key': get_generation_cache_key(kind, model_name, prompt)
+    })
+    item = response.get('Item')
+    return item.get('text') if item else None
+
+def save_cached_generation(paper_id, kind, model_name, prompt, text, content_hash=None):
+    """
+    Stores an LLM generation keyed by (paper, kind, model, prompt version).
     """
-    Saves the extracted text to a temporary file in a given folder.
+    table = dynamodb.Table(SUMMARY_CACHE_TABLE_NAME)
+    item = {
+        'PaperID': int(paper_id),
+        'cache_key': get_generation_cache_key(kind, model_name, prompt),
+        'model': model_name,
+        'prompt_version': get_prompt_version(prompt),
+        'text': text,
+        'created_at': datetime.datetime.utcnow().isoformat()
+    }
+    if content_hash:
+        item['content_hash'] = content_hash
+    table.put_item(Item=item)
+
+def get_paper_generation(paper_id, kind, prompt, load_text, model_name=SUMMARY_MODEL, content_hash=None,
+                         work_class=INGESTION_WORK, user=None):
+    """
+    Returns the cached generation for a paper, calling Gemini only on a miss.
     Args:
-        text (str): The extracted text from the PDF.
-        folder_path (str): Path to the folder where the text file will be saved.
-        original_filename (str): The original filename of the PDF file.
+        paper_id (int): PaperID of the paper.
+        kind (str): Type of generation, "summary" or "sections".
+        prompt (str): Prompt template with a {text} placeholder.
+        load_text (callable): Returns the paper text; only called on a miss.
+        model_name (str): Vertex AI model used for generation.
+        content_hash (str): Content hash of the PDF, stored alongside the result.
+        work_class (str): Scheduler class of the Gemini call.
+        user (str): Scheduler user key of the caller.
     Returns:
-        str: Path to the saved text file.
+        str: The generated (or cached) text, or None if the paper has no text.
     """
-    os.makedirs(folder_path, exist_ok=True)
-    cleaned_filename = clean_filename(original_filename)
-    text_file_path = os.path.join(folder_path, f"{cleaned_filename}.txt")
-    with open(text_file_path, "w", encoding="utf-8") as file:
-        file.write(text)
-    return text_file_path, cleaned_filename
+    cached = get_cached_generation(paper_id, kind, model_name, prompt)
+    if cached:
+        print(f"Cache hit for {kind} of paper {paper_id}")
+        return cached
+
+    text = load_text()
+    if not text or not text.strip():
+        # Unknown paper or no chunks: nothing to summarize, and nothing to cache
+        return None
+
+    vertexai.init(project=GCP_PROJECT_ID, location="us-central1")
+    model = GenerativeModel(model_name)
+    print(f"generating {kind} for paper {paper_id}")
+    input_text = prompt.format(text=text)
+    responseAPI = llm_scheduler.run(work_class, user, lambda: model.generate_content(input_text))
+    generated = responseAPI.candidates[0].content.parts[0].text
+    print("generation done")
 
-def get_embedding(text, model="text-embedding-3-small"):
+    save_cached_generation(paper_id, kind, model_name, prompt, generated, content_hash)
+    return generated
+
+def load_paper_text_from_index(paper_id, batch_size=100):
+    """
+    Rebuilds a paper's text from the chunk bodies stored in Pinecone, for
+    corpus papers whose PDFs are not available to the backend.
+    Args:
+        paper_id (int): PaperID of the paper.
+        batch_size (int): Number of chunk ids fetched per request.
+    Returns:
+        str: The concatenated chunk text, in chunk order.
+    """
+    if chunk_store.has_paper(paper_id):
+        return "\n".join(chunk_store.read_paper(paper_id))
+
+    namespace = paper_scope(paper_id)["namespace"]
+    chunks = []
+    start = 0
+    while True:
+        ids = [f"paper_{paper_id}#chunk_{i}" for i in range(start, start + batch_size)]
+        vectors = index.fetch(ids=ids, namespace=namespace).vectors
+        chunks.extend(get_match_text({"id": vector_id, "metadata": vectors[vector_id].metadata})
+                      for vector_id in ids if vector_id in vectors)
+        if len(vectors) < batch_size:
+            break
+        start += batch_size
+    return "\n".join(chunks)
+
+def get_embedding(text, model="text-embedding-3-small", work_class=INTERACTIVE_WORK, user=None):
     embeddings = []
+    def embed(chunk):
+        # Scheduled per call, so queries interleave with a long ingestion
+        return embedding_scheduler.run(
+            work_class, user, lambda: openAIClient.embeddings.create(input = [chunk], model=model).data[0].embedding)
     for chunk in text: 
         try:
             chunk = chunk.page_content.replace("\n", " ")
-            embeddings.append(openAIClient.embeddings.create(input = [chunk], model=model).data[0].embedding)
+            embeddings.append(embed(chunk))
         except Exception as e:
             chunk = chunk.replace("\n", " ")
-            embeddings.append(openAIClient.embeddings.create(input = [chunk], model=model).data[0].embedding)
+            embeddings.append(embed(chunk))
     return embeddings
 
-def query_pinecone(query, top_k=10, paper_id=None):
-    query_embedding = get_embedding([query])
-    
+def get_embeddings_batch(texts, model="text-embedding-3-small", batch_size=2048, work_class=BATCH_WORK, user=None):
+    """
+    Embeds many texts with one embeddings call per batch_size inputs.
+    Returns:
+        List of embeddings, in input order.
+    """
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        batch = [text.replace("\n", " ") for text in texts[i:i + batch_size]]
+        response = embedding_scheduler.run(
+            work_class, user, lambda: openAIClient.embeddings.create(input=batch, model=model))
+        embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return embeddings
+
+def fetch_metadata(ids, batch_size=100, namespace=None):
+    """
+    Fetches the metadata of many vectors from Pinecone.
+    Returns:
+        dict: vector id -> metadata
+    """
+    namespace = CORPUS_NAMESPACE if namespace is None else namespace
+    metadata = {}
+    for i in range(0, len(ids), batch_size):
+        vectors = index.fetch(ids=ids[i:i + batch_size], namespace=namespace).vectors
+        metadata.update({vector_id: vector.metadata or {} for vector_id, vector in vectors.items()})
+    return metadata
+
+def load_paper_working_set(paper_id, batch_size=100):
+    """
+    Fetches every chunk vector of a paper, with its text, for the paper cache.
+    Returns:
+        PaperWorkingSet, or None if the paper has no vectors.
+    """
+    namespace = paper_scope(paper_id)["namespace"]
+    ids, vectors, metadatas = [], [], []
+    start = 0
+    while True:
+        batch_ids = [f"paper_{paper_id}#chunk_{i}" for i in range(start, start + batch_size)]
+        fetched = index.fetch(ids=batch_ids, namespace=namespace).vectors
+        for vector_id in batch_ids:
+            if vector_id in fetched:
+                metadata = dict(fetched[vector_id].metadata or {})
+                metadata["chunk"] = get_match_text({"id": vector_id, "metadata": metadata})
+                ids.append(vector_id)
+                vectors.append(fetched[vector_id].values)
+                metadatas.append(metadata)
+        if len(fetched) < batch_size:
+            break
+        start += batch_size
+    if not ids:
+        return None
+    return PaperWorkingSet(int(paper_id), ids, vectors, metadatas)
+
+def paper_scope(paper_id=None):
+    """
+    Returns the index.query arguments restricting a search to one paper: its
+    own namespace when it has one, otherwise a metadata filter on the corpus
+    namespace. Without a paper_id the whole shared corpus is searched.
+    """
+    if not paper_id:
+        return {"namespace": CORPUS_NAMESPACE}
+    namespace = paper_namespaces.lookup(paper_id)
+    if namespace:
+        return {"namespace": namespace}
+    return {"namespace": CORPUS_NAMESPACE, "filter": {"paper_id": "paper_"+str(paper_id)}}
+
+def search_ids(query_embedding, top_k=10, paper_id=None):
+    """
+    Phase one of retrieval: ranks chunks and returns only their ids and
+    scores, so candidates can be over-fetched without transferring metadata.
+    Returns:
+        List of {"id", "score"} dicts, best first. Matches from a cached paper
+        working set already carry their metadata.
+    """
+    if paper_id and paper_cache is not None:
+        # Notebook follow-ups are ranked in memory against the paper's chunks
+        working_set = paper_cache.get(paper_id)
+        if working_set is not None:
+            return working_set.search(query_embedding, top_k)["matches"]
+
     # This will be called from the /notebook page with a paper id for querying
-    # If paper_id is None, then we will query ALL the papers
-    filter_condition = None
-    if paper_id:
-        filter_condition = {"paper_id": "paper_"+str(paper_id)} 
-
-    results = index.query(
-        vector=query_embedding,
-        top_k=top_k,
-        include_metadata=True,
-        filter=filter_condition
-    )
-    return results
+    # If paper_id is None, then we will query ALL the corpus papers
+    scope = paper_scope(paper_id)
+    if local_store is not None and scope["namespace"] == CORPUS_NAMESPACE:
+        paper_ids = [int(paper_id)] if paper_id else None
+        return [{"id": vector_id, "score": score} for vector_id, score in local_store.search(query_embedding, top_k, paper_ids)]
+
+    results = index.query(vector=query_embedding, top_k=top_k, include_metadata=False, include_values=False, **scope)
+    return [{"id": match["id"], "score": match["score"]} for match in results.get("matches", [])]
+
+def hydrate_matches(matches, paper_id=None):
+    """
+    Phase two of retrieval: attaches metadata, and with it access to the chunk
+    text, to the selected matches only. Matches that have it already are
+    left as they are.
+    Returns:
+        The same list of matches.
+    """
+    missing = list(dict.fromkeys(match["id"] for match in matches if "metadata" not in match))
+    if missing:
+        metadata = fetch_metadata(missing, namespace=paper_scope(paper_id)["namespace"])
+        for match in matches:
+            if "metadata" not in match:
+                match["metadata"] = metadata.get(match["id"], {})
+    return matches
+
+def select_papers(matches, limit=5):
+    """
+    Returns the distinct PaperIDs of the matches, in relevance order.
+    """
+    return list(dict.fromkeys(int(match['id'].split("#")[0].split("_")[1]) for match in matches))[:limit]
+
+def get_match_text(match):
+    """
+    Returns the chunk text of a vector match. Older vectors carry the text in
+    their metadata; newer ones carry offsets into the local chunk store.
+    """
+    metadata = match.get("metadata") or {}
+    if metadata.get("chunk"):
+        return metadata["chunk"]
+    if "chunk_offset" in metadata:
+        paper_id = int(match["id"].split("#")[0].split("_")[1])
+        try:
+            return chunk_store.read_at(paper_id, int(metadata["chunk_offset"]), int(metadata["chunk_length"]))
+        except FileNotFoundError:
+            print(f"Chunk store has no blob for paper {paper_id}, skipping {match['id']}")
+    return metadata.get("chunk", "")
 
 def get_auth_token():
     auth_request = Request()
@@ -276,14 +728,12 @@ def get_auth_token():
     print(f"Getting auth token: {id_token}")
     return id_token
 
-def generate_answer(query, matches, model_type):
-    context = " ".join(
-        [match.get("metadata", {}).get("chunk", "") for match in matches if "metadata" in match]
-    )
-    input_text = f"This is my question: {query}, please answer the question based on the following context: {context}\n\nDo not mention that you have been given context\n"
-
-    print(input_text)
-
+def call_provider(model_type, input_text):
+    """
+    Sends one prompt to the given LLM provider.
+    Returns:
+        str: The answer text.
+    """
     if model_type == "llama3.2":
         auth_token = get_auth_token()
         print(f"Auth token: {auth_token}")
@@ -295,10 +745,10 @@ def generate_answer(query, matches, model_type):
             "prompt": input_text,
             "stream": False}
         print("generating answer")
-        try:
-            response = requests.post(LLAMA_URL, json=data, headers=headers)
-        except Exception as e:
-            print(f"Error: {e}")
+        # Errors propagate so generate_answer can fall back to the backup provider
+        responseAPI = requests.post(LLAMA_URL, json=data, headers=headers, timeout=LLAMA_TIMEOUT)
+        responseAPI.raise_for_status()
+        response = json.loads(responseAPI.text)['response']
         print("generation done")
     elif model_type == "llama3.3":
         responseAPI = client.chat.completions.create(
@@ -318,11 +768,45 @@ def generate_answer(query, matches, model_type):
         responseAPI = model.generate_content(input_text)
         response = responseAPI.candidates[0].content.parts[0].text
         print("generation done")
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
     return response
 
-def s3_upload(file):
+def generate_answer(query, matches, model_type, hedge=True, work_class=INTERACTIVE_WORK, user=None):
+    # Chunk text is read locally, only for the matches used in the prompt
+    context = " ".join(
+        [get_match_text(match) for match in matches if "metadata" in match]
+    )
+    input_text = f"This is my question: {query}, please answer the question based on the following context: {context}\n\nDo not mention that you have been given context\n"
+
+    print(input_text)
+
+    if model_type not in provider_limiters:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    # Identical prompts in flight share one upstream call. Each provider only
+    # admits a bounded number of concurrent calls, and a slow or failing
+    # primary is hedged with its backup provider.
+    # Set hedge=False when the answer must come from model_type itself.
+    # Only the leader of a coalesced call takes a scheduler slot.
+    key = (model_type, hedge, hashlib.sha256(input_text.encode('utf-8')).hexdigest())
+    def call(provider):
+        return provider_limiters[provider].run(lambda: call_provider(provider, input_text))
+    if not hedge:
+        return answer_single_flight.do(key, lambda: llm_scheduler.run(work_class, user, lambda: call(model_type)))
+    return answer_single_flight.do(
+        key, lambda: llm_scheduler.run(work_class, user, lambda: answer_hedger.call(model_type, call)))
+
+def paper_s3_key(paper_id, filename):
     """
-    Uploads a file to S3 and returns the public URL.
+    S3 key of an uploaded PDF, unique to its paper so that rolling back one
+    upload never touches another paper with the same file name.
+    """
+    return f"paper_{int(paper_id)}/{filename}"
+
+def s3_upload(file, key):
+    """
+    Uploads a file to S3 under key and returns the public URL.
     """
     if file:
         try:
@@ -347,11 +831,11 @@ def s3_upload(file):
             
             s3.Bucket(AWS_STORAGE_BUCKET_NAME).upload_file(
                 temp_file_path,  # Path of the file saved locally
-                file.filename,  # S3 key (filename in the bucket)
+                key,  # S3 key in the bucket
             )
 
             # Generate the file's public URL
-            file_url = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{file.filename}"
+            file_url = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{quote(key)}"
 
             # Clean up: Remove the temporary file
             os.remove(temp_file_path)
@@ -362,42 +846,385 @@ def s3_upload(file):
             print(f"Error uploading file to S3: {e}")
             return ""
     return ""
+
+def s3_delete(key):
+    """
+    Deletes an object uploaded by s3_upload, logging instead of raising.
+    """
+    try:
+        s3 = boto3.resource(
+            "s3",
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            region_name=AWS_REGION,
+        )
+        s3.Object(AWS_STORAGE_BUCKET_NAME, key).delete()
+        print(f"Deleted {key} from S3")
+    except Exception as e:
+        print(f"Error deleting {key} from S3: {e}")
+
+def discard_ingested_paper(paper_id, s3_key=None):
+    """
+    Rolls back a failed upload: deletes the vectors in the paper's namespace,
+    its chunk blob and, given its key, the PDF in S3. No Dynamo row exists
+    for the paper, so its PaperID is allocated again by the next upload,
+    which must not find any of these leftovers.
+    """
+    try:
+        index.delete(delete_all=True, namespace=paper_namespace(paper_id))
+    except Exception as e:
+        print(f"Error deleting namespace of paper {paper_id}: {e}")
+    paper_namespaces.discard(paper_id)
+    chunk_store.delete_paper(paper_id)
+    if paper_cache is not None:
+        paper_cache.invalidate(paper_id)
+    if s3_key:
+        s3_delete(s3_key)
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "OK"}), 200
 
+# Size and serialization time of /query responses, exposed by /queryStats
+query_stats = {"responses": 0, "raw_bytes": 0, "sent_bytes": 0, "serialize_seconds": 0.0}
+query_stats_lock = threading.Lock()
+
+def make_compact_response(payload, status=200):
+    """
+    Serializes a response body compactly and gzips it when the client accepts
+    it. Records bytes and serialization time in query_stats.
+    Args:
+        payload (dict): JSON-serializable response body.
+        status (int): HTTP status code.
+    Returns:
+        Response: The Flask response.
+    """
+    start = time.perf_counter()
+    body = app.json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    raw_bytes = len(body)
+    headers = {"Vary": "Accept-Encoding"}
+    if raw_bytes >= COMPRESSION_MIN_BYTES and request.accept_encodings["gzip"] > 0:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    elapsed = time.perf_counter() - start
+    headers["Server-Timing"] = f"serialize;dur={elapsed * 1000:.2f}"
+
+    with query_stats_lock:
+        query_stats["responses"] += 1
+        query_stats["raw_bytes"] += raw_bytes
+        query_stats["sent_bytes"] += len(body)
+        query_stats["serialize_seconds"] += elapsed
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+def bounded_int(value, name, low, high):
+    """
+    Parses a request field as an integer within [low, high].
+    Returns:
+        tuple: (value, None), or (None, error response) for bad input.
+    """
+    try:
+        if isinstance(value, bool):
+            raise ValueError(name)
+        number = int(value)
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": f"{name} must be an integer"}), 400)
+    if not low <= number <= high:
+        return None, (jsonify({"error": f"{name} must be between {low} and {high}"}), 400)
+    return number, None
+
+def build_match_items(matches, include_text, snippet_length=SNIPPET_LENGTH):
+    """
+    Turns vector matches into compact dicts with either a text preview or the
+    full chunk text.
+    """
+    items = []
+    for match in matches:
+        text = get_match_text(match)
+        item = {
+            "id": match["id"],
+            "paper_id": int(match["id"].split("#")[0].split("_")[1]),
+            "score": round(float(match["score"]), 4)
+        }
+        if include_text:
+            item["text"] = text
+        else:
+            item["preview"] = text[:snippet_length]
+        items.append(item)
+    return items
+
 @app.route('/query', methods=['POST'])
 def query():
+    """
+    Answers a question over the corpus, or over one paper when file_id is set.
+    Clients pick the response fields with "fields", any of "answer", "papers",
+    "snippets" and "chunks"; without it the legacy response is returned.
+    """
     try:
         data = request.json
         query_text = data['query']
         model_type = data.get('model', "llama3.2")
         paper_id = data.get("file_id", None)
+        fields = data.get("fields")
+        if fields is not None:
+            unknown = [field for field in fields if field not in QUERY_FIELDS]
+            if unknown:
+                return jsonify({"error": f"Unknown fields: {unknown}", "allowed": list(QUERY_FIELDS)}), 400
+        snippet_length, error_response = bounded_int(data.get("snippet_length", SNIPPET_LENGTH), "snippet_length",
+                                                     1, MAX_SNIPPET_LENGTH)
+        if error_response:
+            return error_response
+        user = get_request_user(data)
         print(f"1: query text: {query_text}, model type:{model_type}")
-        pinecone_results = query_pinecone(query_text, 10, paper_id)
-        matches = pinecone_results.get("matches", [])
-        if not matches:
-            return jsonify({"answer": "No relevant matches found in the database."})
-        
-        paper_ids = list(set(int(match['id'].split("#")[0].split("_")[1]) for match in matches))[:5]
-        dynamo_response = getPapersFromDynamo(paper_ids)
-        print(f"2: Paper IDs: {paper_ids}")
-        print(f"4: Dynamo Response :{dynamo_response}")
+        # Phase one ranks over-fetched candidates by id and score only; phase
+        # two hydrates just the chunks that are returned or put in the prompt
+        query_embedding = get_embedding([query_text], user=user)[0]
+        candidates = search_ids(query_embedding, 10 if fields is None else QUERY_CANDIDATES, paper_id)
+        matches = candidates[:10]
+        if not matches and fields is None:
+            return jsonify({"answer": NO_MATCHES_ANSWER})
+
+        # Keep relevance order so the cards show the best papers first
+        paper_ids = select_papers(candidates)
+        dynamo_response = []
+        if (fields is None or "papers" in fields) and paper_ids:
+            dynamo_response = getPapersFromDynamo(paper_ids)
+            print(f"2: Paper IDs: {paper_ids}")
+            print(f"4: Dynamo Response :{dynamo_response}")
+
+            if type(dynamo_response) == str:
+                return jsonify({"error": "Failed to retrieve data from DynamoDB.", "details": dynamo_response}), 500
+
+        answer = None
+        if (fields is None or "answer" in fields) and not matches:
+            answer = NO_MATCHES_ANSWER
+        elif fields is None or "answer" in fields:
+            context = hydrate_matches(matches[:CONTEXT_CHUNKS], paper_id)
+            answer = generate_answer(query_text, context, model_type, user=user)
+
+        if fields is None:
+            hydrate_matches(matches, paper_id)
+            return jsonify({"result": str(matches), "dynamo_data": dynamo_response, "answer": answer})
+
+        payload = {}
+        if "answer" in fields:
+            payload["answer"] = answer
+        if "papers" in fields:
+            payload["papers"] = [
+                {"PaperID": item.get("PaperID"), "PaperPDFName": item.get("PaperPDFName"), "PaperLink": item.get("PaperLink")}
+                for item in dynamo_response
+            ]
+        if "snippets" in fields or "chunks" in fields:
+            hydrate_matches(matches, paper_id)
+        if "snippets" in fields:
+            payload["snippets"] = build_match_items(matches, False, snippet_length)
+        if "chunks" in fields:
+            payload["chunks"] = build_match_items(matches, True)
+        return make_compact_response(payload)
+    except ProviderBusyError as e:
+        print(f"Provider busy: {e}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        print("exception raised")
+        error_trace = traceback.format_exc()
+        print(f"Error: {error_trace}")
+        return jsonify({"error": str(e), "trace": error_trace}), 500
 
-        if type(dynamo_response) == str:
-            return jsonify({"error": "Failed to retrieve data from DynamoDB.", "details": dynamo_response}), 500
-        
-        answer = generate_answer(query_text, matches[:3], model_type)
-        if model_type == "llama3.2":
-            answer = json.loads(answer.text)
-            return jsonify({"result": str(matches), "dynamo_data": dynamo_response, "answer": answer['response']})
-        return jsonify({"result": str(matches), "dynamo_data": dynamo_response, "answer": answer})
+@app.route('/query/batch', methods=['POST'])
+def query_batch():
+    """
+    Runs many queries at once: one batched embeddings call, concurrent (or,
+    with the local vector store, vectorized) searches, and optional answers
+    generated with bounded concurrency.
+    Expects JSON with "queries", and optionally "file_id", "top_k", "answer",
+    "model" and "max_concurrency".
+    """
+    try:
+        data = request.json
+        queries = data.get("queries")
+        if not queries or not isinstance(queries, list):
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+        paper_id = data.get("file_id", None)
+        top_k, error_response = bounded_int(data.get("top_k", 10), "top_k", 1, MAX_TOP_K)
+        if error_response:
+            return error_response
+        with_answers = bool(data.get("answer", False))
+        model_type = data.get("model", "llama3.2")
+        max_concurrency = max(1, min(int(data.get("max_concurrency", 4)), MAX_BATCH_ANSWER_CONCURRENCY))
+        user = get_request_user(data)
+
+        timing = {}
+        start = time.perf_counter()
+        embeddings = get_embeddings_batch(queries, user=user)
+        timing["embed_seconds"] = time.perf_counter() - start
+
+        search_start = time.perf_counter()
+        working_set = paper_cache.get(paper_id) if paper_id and paper_cache is not None else None
+        scope = paper_scope(paper_id)
+        if working_set is not None:
+            all_matches = [results["matches"] for results in working_set.search_batch(embeddings, top_k)]
+        elif local_store is not None and scope["namespace"] == CORPUS_NAMESPACE:
+            paper_ids = [int(paper_id)] if paper_id else None
+            all_matches = [
+                [{"id": vector_id, "score": score} for vector_id, score in results]
+                for results in local_store.search_batch(embeddings, top_k, paper_ids)
+            ]
+        else:
+            def search(embedding):
+                results = index.query(vector=embedding, top_k=top_k, include_metadata=False, **scope)
+                return [{"id": match["id"], "score": match["score"]} for match in results.get("matches", [])]
+            with ThreadPoolExecutor(max_workers=BATCH_SEARCH_CONCURRENCY) as executor:
+                all_matches = list(executor.map(search, embeddings))
+        if with_answers:
+            # Only the chunks used for answering need their metadata, fetched in one pass
+            hydrate_matches([match for matches in all_matches for match in matches[:CONTEXT_CHUNKS]], paper_id)
+        timing["search_seconds"] = time.perf_counter() - search_start
+
+        answers = [None] * len(queries)
+        if with_answers:
+            answer_start = time.perf_counter()
+            def answer(position):
+                if not all_matches[position]:
+                    return NO_MATCHES_ANSWER
+                try:
+                    return generate_answer(queries[position], all_matches[position][:CONTEXT_CHUNKS], model_type,
+                                           work_class=BATCH_WORK, user=user)
+                except Exception as e:
+                    print(f"Error answering query {position}: {e}")
+                    return None
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                answers = list(executor.map(answer, range(len(queries))))
+            timing["answer_seconds"] = time.perf_counter() - answer_start
+
+        timing["total_seconds"] = time.perf_counter() - start
+        timing["queries_per_sec"] = len(queries) / timing["total_seconds"]
+
+        results = []
+        for position, query_text in enumerate(queries):
+            result = {
+                "query": query_text,
+                "matches": [{"id": match["id"], "score": round(float(match["score"]), 4)} for match in all_matches[position]]
+            }
+            if with_answers:
+                result["answer"] = answers[position]
+            results.append(result)
+        return make_compact_response({"results": results, "timing": timing})
+    except ProviderBusyError as e:
+        print(f"Provider busy: {e}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
     except Exception as e:
         print("exception raised")
         error_trace = traceback.format_exc()
         print(f"Error: {error_trace}")
         return jsonify({"error": str(e), "trace": error_trace}), 500
 
+@app.route('/providerStats', methods=['GET'])
+def providerStats():
+    """
+    Reports queue depth, wait times, coalescing, hedging and per-class
+    scheduling for the LLM providers and embeddings.
+    """
+    return jsonify({
+        "providers": {name: limiter.stats() for name, limiter in provider_limiters.items()},
+        "single_flight": answer_single_flight.stats(),
+        "hedging": answer_hedger.stats(),
+        "scheduler": {"llm": llm_scheduler.stats(), "embedding": embedding_scheduler.stats()}
+    }), 200
+
+# Papers uploaded through other instances reach the title index by polling
+# the paper table, as NamespaceDirectory polls the index stats
+title_index_refreshed_at = None
+title_index_refresh_lock = threading.Lock()
+
+def load_new_titles():
+    """
+    Adds papers with a PaperID above the highest indexed one from the paper
+    table. PaperIDs are allocated in increasing order, so these are the
+    papers uploaded since the last refresh.
+    Returns:
+        int: Number of papers read.
+    """
+    table = dynamodb.Table(TABLE_NAME)
+    scan_kwargs = {
+        "ProjectionExpression": "PaperID, PaperLink, PaperPDFName",
+        "FilterExpression": Attr("PaperID").gt(max(title_index.paper_ids, default=-1)),
+    }
+    papers = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        papers.extend((item["PaperID"], item.get("PaperLink"), item.get("PaperPDFName", ""))
+                      for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    title_index.add_many(papers)
+    return len(papers)
+
+def refresh_title_index():
+    """
+    Starts a background load of new titles when the last one is older than
+    TITLE_INDEX_REFRESH_SECONDS; requests never wait for it.
+    """
+    global title_index_refreshed_at
+    now = time.monotonic()
+    if title_index_refreshed_at is not None and now - title_index_refreshed_at < TITLE_INDEX_REFRESH_SECONDS:
+        return
+    if not title_index_refresh_lock.acquire(blocking=False):
+        return
+    title_index_refreshed_at = now
+
+    def run():
+        try:
+            added = load_new_titles()
+            if added:
+                print(f"Title index refreshed: {added} new papers")
+        except Exception as e:
+            print(f"Could not refresh title index: {e}")
+        finally:
+            title_index_refresh_lock.release()
+    threading.Thread(target=run, name="title-index-refresh", daemon=True).start()
+
+@app.route('/titleSearch', methods=['GET'])
+def titleSearch():
+    """
+    Typo-tolerant paper title search, answered from the in-memory title index.
+    Query parameters: "q" and optionally "limit".
+    """
+    query_text = request.args.get("q", "")
+    limit = max(1, min(request.args.get("limit", 10, type=int), MAX_TITLE_RESULTS))
+    refresh_title_index()
+    start = time.perf_counter()
+    results = title_index.search(query_text, limit)
+    return jsonify({"results": results, "took_us": round((time.perf_counter() - start) * 1e6)}), 200
+
+@app.route('/titleAutocomplete', methods=['GET'])
+def titleAutocomplete():
+    """
+    Completes a partially typed paper title from the in-memory title index.
+    Query parameters: "q" and optionally "limit".
+    """
+    prefix = request.args.get("q", "")
+    limit = max(1, min(request.args.get("limit", 8, type=int), MAX_TITLE_RESULTS))
+    refresh_title_index()
+    start = time.perf_counter()
+    results = title_index.autocomplete(prefix, limit)
+    return jsonify({"results": results, "took_us": round((time.perf_counter() - start) * 1e6)}), 200
+
+@app.route('/queryStats', methods=['GET'])
+def queryStats():
+    with query_stats_lock:
+        stats = dict(query_stats)
+    if paper_cache is not None:
+        stats["paper_cache"] = paper_cache.stats()
+    stats["title_index"] = title_index.stats()
+    stats["namespaces"] = paper_namespaces.stats()
+    if stats["responses"]:
+        stats["avg_raw_bytes"] = stats["raw_bytes"] / stats["responses"]
+        stats["avg_sent_bytes"] = stats["sent_bytes"] / stats["responses"]
+        stats["avg_serialize_ms"] = stats["serialize_seconds"] * 1000 / stats["responses"]
+    return jsonify(stats), 200
+
 def get_last_paper_id():
     try:
         # Access the table
@@ -422,11 +1249,65 @@ def get_last_paper_id():
         print(f"Error: {e}")
         return None
 
-def batch_upsert(index, vectors, batch_size=100):
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i:i+batch_size]
-        index.upsert(vectors=batch)
-    print("Uploaded successfully")
+def get_request_user(data=None):
+    """
+    Returns the scheduler user key of the current request: the uuid in the
+    JWT token when one is sent (in the body or an Authorization header),
+    otherwise the client address.
+    """
+    token = (data or {}).get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if token:
+        try:
+            user_uuid = jwt.decode(token, SECRET, algorithms=["HS256"]).get("uuid")
+            if user_uuid:
+                return f"user:{user_uuid}"
+        except jwt.InvalidTokenError:
+            pass
+    return f"addr:{request.remote_addr or ''}"
+
+def add_paper_to_user(token, paper_id):
+    """
+    Appends a PaperID to the library of the user identified by the JWT token.
+    Args:
+        token (str): JWT issued by /login.
+        paper_id (int): PaperID to link to the user.
+    Returns:
+        tuple: An error response to return to the client, or None on success.
+    """
+    userTable = dynamodb.Table(USER_TABLE_NAME)
+    decoded_payload = jwt.decode(token, SECRET, algorithms=["HS256"])
+    user_uuid = decoded_payload.get('uuid')
+    email = decoded_payload.get("email")
+
+    try:
+        # Update paperId by appending this to user from user table based on uuid
+        response = userTable.get_item(Key={'email': email, 'user_id': user_uuid})
+        if 'Item' not in response:
+            return {"error": "User not found"}, 404
+
+        user_item = response['Item']
+
+        # Append the new paper ID to the paper_id list
+        existing_papers = user_item.get('paper_id', [])
+        if not isinstance(existing_papers, list):
+            return {"error": "Invalid paper_id field. Expected a list."}, 400
+
+        if int(paper_id) in existing_papers:
+            print(f"Paper ID {paper_id} already exists in the user's list")
+            return None
+
+        updated_papers = existing_papers + [int(paper_id)]
+
+        # Update the record in DynamoDB
+        userTable.update_item(
+            Key={'email': email,  'user_id': user_uuid},
+            UpdateExpression="SET paper_id = :new_paper_list",
+            ExpressionAttributeValues={':new_paper_list': updated_papers},
+            ReturnValues="UPDATED_NEW"
+        )
+    except Exception as e:
+        print("Error: ", e)
+    return None
 
 @app.route('/summarize', methods=['POST'])
 def summarize():    
@@ -435,6 +1316,7 @@ def summarize():
     Summarizes the uploaded PDF file.
     Expects a PDF file to be uploaded as a POST request.
     """
+    text_file_path = None
     try:
         table = dynamodb.Table(TABLE_NAME)
         # Check if a file is uploaded
@@ -443,122 +1325,169 @@ def summarize():
 
         file = request.files['file']
         token = request.form.get("token", None)
+        user = get_request_user({"token": token})
         original_filename = file.filename
         
         get_eval = request.form.get('get_eval', 'false').lower() in ['true', '1', 't', 'y', 'yes']
 
-        # Store in S3
-        s3_link = s3_upload(file)
-
-        # # Extract text from the PDF
-        text = parse_pdf_to_text(file)
-
-        # Optionally save the extracted text to a temporary file
-        temp_folder = "/tmp/pdf_texts"  # Define a temporary folder for saving text files
-        temp_file_path, file_text_name = save_text_to_temp_file(text, temp_folder, original_filename)
-        
-        # Get latest paper ID
-        latest_paper_id = get_last_paper_id()
-        new_paper_id = latest_paper_id + 1
-
-        # chunk + embedding of new file
-        chunks = split_text_with_langchain(text)
-        embeddings = get_embedding(chunks)
-
-        # Store in pinecone
-        pinecone_chunks = []
-        for i, value in enumerate(chunks):
-            temp_dict = {}
-            temp_dict["id"] = "paper_" + str(new_paper_id) + "#chunk_" + str(i)
-            temp_dict["values"] = embeddings[i]                
-            temp_dict["metadata"] = {"paper_id": "paper_"+str(new_paper_id), "chunk_id": "chunk_" + str(i), "chunk": chunks[i]}
-            pinecone_chunks.append(temp_dict)
-
-        batch_upsert(index, pinecone_chunks)
-
-        # Store in dynamo
-        data_to_add = {
-            "PaperTxtName": file_text_name + ".txt", 
-            "PaperID": int(new_paper_id),  
-            "PaperLink": s3_link,
-            "PaperPDFName": original_filename
-        }
+        # Fingerprint the upload so a known paper skips the ingestion pipeline
+        content_hash = hash_pdf_file(file)
+        known_paper = get_paper_by_hash(content_hash)
+
+        if known_paper:
+            # Same content was ingested before: reuse its PaperID and vectors
+            new_paper_id = int(known_paper['PaperID'])
+            print(f"Duplicate upload of paper {new_paper_id}, skipping ingestion")
+            # Parsed lazily, only if a generation below misses the cache
+            if token:
+                error_response = add_paper_to_user(token, new_paper_id)
+                if error_response:
+                    return error_response
+        else:
+            # Refuse before storing anything if ingestion would be rejected;
+            # a later rejection rolls the upload back
+            embedding_scheduler.admit(INGESTION_WORK)
 
-        table.put_item(Item=data_to_add)
+            # Get latest paper ID
+            latest_paper_id = get_last_paper_id()
+            new_paper_id = latest_paper_id + 1
 
-        if token:
-            userTable = dynamodb.Table(USER_TABLE_NAME)
-            decoded_payload = jwt.decode(token, SECRET, algorithms=["HS256"])
-            user_uuid = decoded_payload.get('uuid')
-            email = decoded_payload.get("email")
+            # Store in S3
+            s3_key = paper_s3_key(new_paper_id, original_filename)
+            s3_link = s3_upload(file, s3_key)
 
             try:
-                # Update paperId by appending this to user from user table based on uuid
-                response = userTable.get_item(Key={'email': email, 'user_id': user_uuid})
-                if 'Item' not in response:
-                    return {"error": "User not found"}, 404
-
-                user_item = response['Item']
-
-                # Append the new paper ID to the paper_id list
-                existing_papers = user_item.get('paper_id', [])
-                if not isinstance(existing_papers, list):
-                    return {"error": "Invalid paper_id field. Expected a list."}, 400
-                
-                if new_paper_id in existing_papers:
-                    return {"message": "Paper ID already exists in the user's list"}, 200
-                
-                updated_papers = existing_papers + [int(new_paper_id)]
-
-                # Update the record in DynamoDB
-                userTable.update_item(
-                    Key={'email': email,  'user_id': user_uuid},
-                    UpdateExpression="SET paper_id = :new_paper_list",
-                    ExpressionAttributeValues={':new_paper_list': updated_papers},
-                    ReturnValues="UPDATED_NEW"
-                )
-            except Exception as e:
-                print("Error: ", e)
-
-        query = "Summarize the content clearly and concisely with a maximum word limit of 300 words."
-
-        # responseAPI = client.chat.completions.create(
-        # model="meta-llama/Llama-3.3-70B-Instruct-Turbo",
-        # messages=[
-        #         {"role": "system", "content": "You are a helpful assistant for the conducting research that answers questions based on provided context. Don't mention anything about the context when answering"},
-        #         {"role": "user", "content": text}
-        #     ],
-        # stream=False)
-        # print("generating answer")
-        # response = responseAPI.choices[0].message.content
-        # print("generation done")
-
-        vertexai.init(project=GCP_PROJECT_ID, location="us-central1")
-        model = GenerativeModel("gemini-1.5-flash-002")
-        
-        input_text = f"\nPaper: {text}\n\nProvide a detailed summary based on the given paper, Give plain text avoid markdown don't give any extra information out of the scope of the given paper.\n"
-
-        print("generating answer")
+                # Pages stream through chunking, embedding and upserts with bounded
+                # queues, and into the text file; nothing holds the whole document
+                temp_folder = "/tmp/pdf_texts"  # Define a temporary folder for saving text files
+                os.makedirs(temp_folder, exist_ok=True)
+                file_text_name = clean_filename(original_filename)
+                # One file per request: uploads may share a file name
+                text_file_path = os.path.join(temp_folder, f"{uuid.uuid4().hex}.txt")
+                with open(text_file_path, "w", encoding="utf-8") as text_file:
+                    def pages():
+                        for page in iter_pdf_pages(file):
+                            text_file.write(page)
+                            yield page
+
+                    # Uploads go to their own namespace, so notebook queries need no filter.
+                    # The paper is not linked anywhere yet, so its vectors can land
+                    # before the chunk blob is closed.
+                    ingest_stats = ingest_paper(
+                        pages(), new_paper_id, chunk_store.writer(new_paper_id),
+                        lambda texts: get_embeddings_batch(texts, work_class=INGESTION_WORK, user=user),
+                        ParallelUpserter(index, max_in_flight=UPSERT_MAX_IN_FLIGHT, namespace=paper_namespace(new_paper_id)),
+                        CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, INGEST_EMBED_BATCH_SIZE
+                    )
+                print(f"Ingested paper {new_paper_id}: {ingest_stats['pages']} pages, {ingest_stats['chunks']} chunks "
+                      f"in {ingest_stats['seconds']:.1f}s ({ingest_stats['upsert']['vectors_per_sec']:.0f} vectors/s)")
+                paper_namespaces.add(new_paper_id)
+                if paper_cache is not None:
+                    # Drop a working set loaded while the upsert was in progress
+                    paper_cache.invalidate(new_paper_id)
+
+                # Claim the content hash before writing the paper row; of
+                # concurrent uploads of the same PDF only the first is kept
+                stored_paper_id = save_paper_hash(content_hash, new_paper_id)
+                if stored_paper_id != new_paper_id:
+                    print(f"Concurrent upload of paper {stored_paper_id}, discarding paper {new_paper_id}")
+                    discard_ingested_paper(new_paper_id, s3_key if s3_link else None)
+                else:
+                    # Store in dynamo
+                    data_to_add = {
+                        "PaperTxtName": file_text_name + ".txt", 
+                        "PaperID": int(new_paper_id),  
+                        "PaperLink": s3_link,
+                        "PaperPDFName": original_filename
+                    }
+
+                    try:
+                        table.put_item(Item=data_to_add)
+                    except BaseException:
+                        release_paper_hash(content_hash, new_paper_id)
+                        raise
+            except BaseException:
+                # Leftover vectors would mix into the next upload, which gets the same PaperID
+                discard_ingested_paper(new_paper_id, s3_key if s3_link else None)
+                raise
+            if stored_paper_id == new_paper_id:
+                title_index.add(new_paper_id, s3_link, original_filename)
+            new_paper_id = stored_paper_id
+
+            if token:
+                error_response = add_paper_to_user(token, new_paper_id)
+                if error_response:
+                    return error_response
+
+        parsed = {}
+        def load_text():
+            if 'text' not in parsed:
+                if text_file_path:
+                    with open(text_file_path, "r", encoding="utf-8") as text_file:
+                        parsed['text'] = text_file.read()
+                else:
+                    parsed['text'] = parse_pdf_to_text(file)
+            return parsed['text']
+
+        response = None
         try:
-            print("test")
-            responseAPI = model.generate_content(input_text)
-            response = responseAPI.candidates[0].content.parts[0].text
+            response = get_paper_generation(new_paper_id, "summary", SUMMARY_PROMPT, load_text,
+                                            content_hash=content_hash, user=user)
         except Exception as e:
             print(e)
-            
-        print("generation done")
 
         if get_eval:
             evaluation_scores = {}
-            eval_input_text = f"\nPaper: {text}\n\nPlease give the Abstract, Introdution and the conclusion from the paper. Give those sections as is. Give plain text avoid markdown don't give any extra information out of the scope of the given paper.\n"
-            responseAPI = model.generate_content(eval_input_text)
-            labels = responseAPI.candidates[0].content.parts[0].text
+            labels = get_paper_generation(new_paper_id, "sections", SECTIONS_PROMPT, load_text,
+                                          content_hash=content_hash, user=user)
 
             rouge = Rouge()
             rouge_scores = rouge.get_scores(response, labels, avg=True)
             evaluation_scores['rouge'] = rouge_scores
             return jsonify({"message": str(response), "Evalutation_metric": evaluation_scores}), 200
         return jsonify({"message": str(response)}), 200
+    except ProviderBusyError as e:
+        print(f"Provider busy: {e}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if text_file_path:
+            try:
+                os.remove(text_file_path)
+            except OSError:
+                pass
+
+@app.route('/getSummary', methods=['POST'])
+def getSummary():
+    """
+    Returns the summary of any paper by PaperID, including the preloaded corpus.
+    Expects JSON with "PaperID", and optionally "model" and "generate". When
+    "generate" is false only the cache is consulted.
+    """
+    try:
+        data = request.get_json()
+        paper_id = data.get("PaperID")
+        if paper_id is None:
+            return jsonify({"error": "PaperID is required"}), 400
+        paper_id = int(paper_id)
+        model_name = data.get("model", SUMMARY_MODEL)
+        if model_name not in SUMMARY_MODELS:
+            return jsonify({"error": f"Unsupported model: {model_name}", "allowed": sorted(SUMMARY_MODELS)}), 400
+        generate = data.get("generate", True)
+
+        if not generate:
+            summary = get_cached_generation(paper_id, "summary", model_name, SUMMARY_PROMPT)
+            if not summary:
+                return jsonify({"error": "No cached summary for this paper"}), 404
+        else:
+            summary = get_paper_generation(paper_id, "summary", SUMMARY_PROMPT,
+                                           lambda: load_paper_text_from_index(paper_id), model_name,
+                                           work_class=BATCH_WORK, user=get_request_user(data))
+            if summary is None:
+                return jsonify({"error": "No text found for this paper"}), 404
+
+        return jsonify({"PaperID": paper_id, "model": model_name, "summary": summary}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
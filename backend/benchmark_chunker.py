@@ -0,0 +1,118 @@
+import os
+import re
+import time
+import argparse
+import numpy as np
+
+from chunker import stream_chunks, get_token_counter
+
+# Compares the streaming token-aware chunker with the LangChain character
+# splitter it replaced, on speed and on chunk-size (token) variance.
+#
+#   python benchmark_chunker.py --text-dir parsed_texts/ --limit 200
+#   python benchmark_chunker.py --pdf-dir papers/
+# Without a directory, synthetic pages are used.
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def approximate_token_counter(texts):
+    # Words and punctuation marks, for machines without the tiktoken vocabulary
+    return [len(WORD_PATTERN.findall(text)) for text in texts]
+
+def load_named_documents(pdf_dir=None, text_dir=None, limit=None):
+    """
+    Reads the first limit PDFs of pdf_dir, or text files of text_dir, in
+    name order.
+    Returns:
+        dict: File name without extension -> list of page texts.
+    """
+    documents = {}
+    if pdf_dir:
+        from pypdf import PdfReader
+        for name in sorted(name for name in os.listdir(pdf_dir) if name.endswith(".pdf"))[:limit]:
+            reader = PdfReader(os.path.join(pdf_dir, name))
+            documents[name[:-4]] = [page.extract_text() or "" for page in reader.pages]
+    else:
+        for name in sorted(name for name in os.listdir(text_dir) if name.endswith(".txt"))[:limit]:
+            with open(os.path.join(text_dir, name), "r", encoding="utf-8") as file:
+                text = file.read()
+            # Parsed texts have no page breaks left, so use fixed-size pages
+            documents[name[:-4]] = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    return documents
+
+def load_documents(args):
+    """
+    Returns a list of documents, each a list of page texts.
+    """
+    documents = []
+    if args.pdf_dir or args.text_dir:
+        documents = list(load_named_documents(args.pdf_dir, args.text_dir, args.limit).values())
+    else:
+        rng = np.random.default_rng(0)
+        words = ["model", "data", "results", "we", "propose", "the", "network", "training", "of", "a", "loss", "(Fig. 3)"]
+        for _ in range(args.limit):
+            pages = []
+            for _ in range(12):
+                sentences = [" ".join(rng.choice(words, rng.integers(5, 40))) + "." for _ in range(40)]
+                pages.append(" ".join(sentences) + "\n\n")
+            documents.append(pages)
+    return documents
+
+def size_stats(token_counts, elapsed):
+    counts = np.array(token_counts)
+    return {
+        "seconds": elapsed,
+        "chunks": int(counts.size),
+        "tokens_mean": float(counts.mean()),
+        "tokens_std": float(counts.std()),
+        "tokens_cv": float(counts.std() / counts.mean()),
+        "tokens_min": int(counts.min()),
+        "tokens_max": int(counts.max()),
+    }
+
+def run_langchain(documents, chunk_size, chunk_overlap, count_tokens):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    start = time.perf_counter()
+    chunks = []
+    for pages in documents:
+        # Same construction per call as the old split_text_with_langchain
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                  separators=["\n\n", "\n", " ", ""])
+        chunks.extend(splitter.split_text("".join(pages)))
+    elapsed = time.perf_counter() - start
+    return size_stats(count_tokens(chunks), elapsed)
+
+def run_stream(documents, chunk_tokens, overlap_tokens, count_tokens):
+    start = time.perf_counter()
+    token_counts = []
+    for pages in documents:
+        token_counts.extend(chunk.token_count for chunk in stream_chunks(iter(pages), chunk_tokens, overlap_tokens, count_tokens))
+    elapsed = time.perf_counter() - start
+    return size_stats(token_counts, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the streaming chunker against the LangChain splitter.")
+    parser.add_argument("--pdf-dir", default=None)
+    parser.add_argument("--text-dir", default=None)
+    parser.add_argument("--limit", type=int, default=50, help="Number of documents")
+    parser.add_argument("--chunk-size", type=int, default=4000, help="LangChain chunk size in characters")
+    parser.add_argument("--chunk-overlap", type=int, default=500, help="LangChain overlap in characters")
+    parser.add_argument("--chunk-tokens", type=int, default=1000)
+    parser.add_argument("--overlap-tokens", type=int, default=125)
+    parser.add_argument("--approximate-tokens", action="store_true", help="Count words instead of tiktoken tokens")
+    args = parser.parse_args()
+
+    count_tokens = approximate_token_counter if args.approximate_tokens else get_token_counter()
+    documents = load_documents(args)
+    total_chars = sum(len(page) for pages in documents for page in pages)
+    print(f"{len(documents)} documents, {total_chars / 1e6:.1f}M characters")
+
+    results = {
+        f"langchain {args.chunk_size}/{args.chunk_overlap} chars": run_langchain(documents, args.chunk_size, args.chunk_overlap, count_tokens),
+        f"stream {args.chunk_tokens}/{args.overlap_tokens} tokens": run_stream(documents, args.chunk_tokens, args.overlap_tokens, count_tokens),
+    }
+    for name, entry in results.items():
+        print(f"{name:30s} {entry['seconds']:7.3f}s  {entry['chunks']:6d} chunks  "
+              f"tokens mean {entry['tokens_mean']:7.1f} std {entry['tokens_std']:6.1f} "
+              f"(cv {entry['tokens_cv']:.3f}, min {entry['tokens_min']}, max {entry['tokens_max']})")
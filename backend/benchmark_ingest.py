@@ -0,0 +1,117 @@
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+
+from chunk_store import ChunkStore
+from chunker import stream_chunks
+from ingest import ingest_paper
+from vector_upsert import ParallelUpserter
+from benchmark_chunker import approximate_token_counter
+
+# Peak memory of ingesting synthetic PDFs of growing size, streamed through
+# ingest.py versus the eager path that kept every page, chunk, embedding and
+# vector record in lists. Embeddings and upserts are simulated, so only the
+# pipeline itself is measured. Peak memory is traced Python allocations.
+#
+#   python benchmark_ingest.py --pages 50 200 800
+
+WORDS = ["model", "data", "results", "we", "propose", "the", "network", "training", "of", "a", "loss", "(Fig. 3)"]
+
+def escape_pdf_text(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_synthetic_pdf(path, page_count, lines_per_page=50, seed=0):
+    """
+    Writes a text-only PDF with page_count pages of random sentences.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = []
+    with open(path, "wb") as file:
+        def add_object(number, body):
+            offsets.append((number, file.tell()))
+            file.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        file.write(b"%PDF-1.4\n")
+        page_numbers = [4 + 2 * i for i in range(page_count)]
+        add_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{number} 0 R" for number in page_numbers)
+        add_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode())
+        add_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for number in page_numbers:
+            lines = [" ".join(rng.choice(WORDS, rng.integers(6, 14))) + "." for _ in range(lines_per_page)]
+            content = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({escape_pdf_text(line)}) '" for line in lines) + " ET"
+            add_object(number, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R >>").encode())
+            add_object(number + 1, f"<< /Length {len(content)} >>\nstream\n{content}\nendstream".encode())
+
+        xref = file.tell()
+        total = 4 + 2 * page_count
+        positions = dict(offsets)
+        file.write(f"xref\n0 {total}\n0000000000 65535 f \n".encode())
+        for number in range(1, total):
+            file.write(f"{positions[number]:010d} 00000 n \n".encode())
+        file.write(f"trailer\n<< /Size {total} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def iter_pages(path):
+    from pypdf import PdfReader
+    with open(path, "rb") as file:
+        for page in PdfReader(file).pages:
+            yield page.extract_text() or ""
+
+def fake_embed(texts, dim=1536):
+    return np.random.default_rng(len(texts)).standard_normal((len(texts), dim)).astype(np.float32).tolist()
+
+class DiscardingIndex:
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self.vectors = 0
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(self.latency)
+        self.vectors += len(vectors)
+
+def run_eager(path, store, paper_id, index):
+    pages = list(iter_pages(path))
+    text = "".join(pages)
+    chunk_records = list(stream_chunks(pages, 1000, 125, approximate_token_counter))
+    chunks = [chunk.text for chunk in chunk_records]
+    embeddings = fake_embed(chunks)
+    offsets = store.write_paper(paper_id, chunks)
+    vectors = [{"id": f"paper_{paper_id}#chunk_{i}", "values": embeddings[i],
+                "metadata": {"paper_id": f"paper_{paper_id}", "chunk_offset": offsets[i][0], "chunk_length": offsets[i][1]}}
+               for i in range(len(chunks))]
+    ParallelUpserter(index).upsert(vectors)
+    return len(text)
+
+def run_streaming(path, store, paper_id, index):
+    return ingest_paper(iter_pages(path), paper_id, store.writer(paper_id), fake_embed, ParallelUpserter(index),
+                        1000, 125, count_tokens=approximate_token_counter)
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of eager vs streaming ingestion.")
+    parser.add_argument("--pages", nargs="+", type=int, default=[50, 200, 800])
+    parser.add_argument("--upsert-latency", type=float, default=0.01, help="Simulated seconds per upsert request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        store = ChunkStore(os.path.join(path, "chunks"))
+        print(f"{'pages':>6} {'pdf MB':>8} {'eager peak MB':>14} {'stream peak MB':>15} {'eager s':>8} {'stream s':>9}")
+        for page_count in args.pages:
+            pdf_path = os.path.join(path, f"synthetic_{page_count}.pdf")
+            write_synthetic_pdf(pdf_path, page_count)
+            eager_peak, eager_time = measure(run_eager, pdf_path, store, 1, DiscardingIndex(args.upsert_latency))
+            stream_peak, stream_time = measure(run_streaming, pdf_path, store, 2, DiscardingIndex(args.upsert_latency))
+            print(f"{page_count:6d} {os.path.getsize(pdf_path) / 2 ** 20:8.1f} {eager_peak:14.1f} {stream_peak:15.1f} "
+                  f"{eager_time:8.1f} {stream_time:9.1f}")
@@ -0,0 +1,76 @@
+import time
+import argparse
+import numpy as np
+
+from paper_namespaces import paper_namespace
+from migrate_namespaces import fetch_records
+
+# Compares notebook query latency of the two layouts for the same papers:
+# a metadata-filtered query on the shared corpus namespace against a query
+# on the paper's own namespace. Needs papers present in both, e.g. after
+#   python migrate_namespaces.py --keep-source --papers 2701 2702
+#
+#   python benchmark_namespaces.py --papers 2701 2702 --queries 50
+
+def time_query(index, vector, top_k, **scope):
+    start = time.perf_counter()
+    results = index.query(vector=vector, top_k=top_k, include_metadata=False, **scope)
+    return time.perf_counter() - start, [match["id"] for match in results.get("matches", [])]
+
+def benchmark(index, corpus_namespace, paper_ids, queries_per_paper, top_k, seed=0):
+    rng = np.random.default_rng(seed)
+    latencies = {"filtered": [], "namespace": []}
+    overlap = []
+    for paper_id in paper_ids:
+        namespace = paper_namespace(paper_id)
+        listed = [vector_id for page in index.list(prefix=f"paper_{paper_id}#", namespace=namespace) for vector_id in page]
+        vectors = np.array([record["values"] for record in fetch_records(index, listed, namespace)], dtype=np.float32)
+        if not len(vectors):
+            print(f"paper {paper_id} has no vectors in {namespace}, skipped")
+            continue
+        # Queries are perturbed chunk vectors, like a question close to a chunk
+        picks = vectors[rng.integers(0, len(vectors), queries_per_paper)]
+        queries = picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32)
+        for query in queries.tolist():
+            # Alternate the order so neither layout benefits from warm caches
+            layouts = [("filtered", {"namespace": corpus_namespace, "filter": {"paper_id": f"paper_{paper_id}"}}),
+                       ("namespace", {"namespace": namespace})]
+            if rng.random() < 0.5:
+                layouts.reverse()
+            ids = {}
+            for name, scope in layouts:
+                latency, ids[name] = time_query(index, query, top_k, **scope)
+                latencies[name].append(latency)
+            if ids["namespace"]:
+                overlap.append(len(set(ids["filtered"]) & set(ids["namespace"])) / len(ids["namespace"]))
+
+    report = {}
+    for name, values in latencies.items():
+        values = np.array(values) * 1000
+        if values.size:
+            report[name] = {
+                "queries": int(values.size),
+                "latency_ms_p50": float(np.percentile(values, 50)),
+                "latency_ms_p95": float(np.percentile(values, 95)),
+                "latency_ms_mean": float(values.mean()),
+            }
+    report["filtered_overlap@k"] = float(np.mean(overlap)) if overlap else None
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark filtered vs namespace-partitioned paper queries.")
+    parser.add_argument("--papers", nargs="+", type=int, required=True, help="PaperIDs present in both layouts")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per paper")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    from app import index, CORPUS_NAMESPACE
+
+    report = benchmark(index, CORPUS_NAMESPACE, args.papers, args.queries, args.top_k)
+    for name in ("filtered", "namespace"):
+        if name in report:
+            entry = report[name]
+            print(f"{name:10s} {entry['queries']:5d} queries  p50 {entry['latency_ms_p50']:7.1f} ms  "
+                  f"p95 {entry['latency_ms_p95']:7.1f} ms  mean {entry['latency_ms_mean']:7.1f} ms")
+    if report["filtered_overlap@k"] is not None:
+        print(f"Filtered results matching the namespace top-{args.top_k}: {report['filtered_overlap@k']:.3f}")
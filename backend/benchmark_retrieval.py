@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+
+from chunker import stream_chunks, get_token_counter
+from vector_store import QuantizedVectorStore, normalize
+from benchmark_chunker import approximate_token_counter, load_named_documents
+
+# Offline retrieval benchmark: latency versus quality across chunk sizes and
+# top_k. Every chunking configuration is rebuilt over the same corpus sample
+# into a local float32 vector store, and a labelled query set is run against
+# it. Reports recall@k, MRR@k, prompt tokens and search latency.
+#
+# Corpus: a directory of extracted texts named like PaperTxtName
+# ("<cleaned name>.txt"), or of PDFs. Query set: JSONL, one item per line:
+#   {"query": "...", "paper": "<cleaned name>", "evidence": "optional quote"}
+# A hit is a chunk of the labelled paper; when "evidence" is given the chunk
+# must also contain it.
+#
+# Embeddings are cached per text under --cache, so reruns and new top_k
+# values cost no API calls. --hashed-embeddings uses local feature hashing
+# instead of OpenAI and counts words instead of tiktoken tokens, for runs
+# without network access.
+#
+#   python benchmark_retrieval.py --text-dir texts/ --queries labelled.jsonl \
+#       --chunk-tokens 250 500 1000 2000 --top-k 3 5 10 20
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+# Embedding requests are limited to 300k tokens and 2048 inputs; stay below
+MAX_BATCH_TOKENS = 250000
+MAX_BATCH_INPUTS = 2048
+
+def normalize_text(text):
+    return " ".join(text.lower().split())
+
+def load_queries(path, corpus):
+    with open(path, "r", encoding="utf-8") as file:
+        items = [json.loads(line) for line in file if line.strip()]
+    missing = [item["paper"] for item in items if item["paper"] not in corpus]
+    if missing:
+        print(f"Skipping {len(missing)} queries whose paper is not in the corpus sample, e.g. {missing[0]}")
+    return [item for item in items if item["paper"] in corpus]
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by the SHA-256 of (model, text), persisted as one .npy
+    matrix plus a JSON list of keys.
+    """
+
+    def __init__(self, path, model, embed, count_tokens, max_batch_tokens=MAX_BATCH_TOKENS,
+                 max_batch_inputs=MAX_BATCH_INPUTS):
+        """
+        Args:
+            embed (callable): Maps a list of texts to their embeddings.
+            count_tokens (callable): Maps texts to token counts, to size the batches.
+            max_batch_tokens (int): Token budget of one embed call.
+            max_batch_inputs (int): Texts per embed call.
+        """
+        self.path = path
+        self.model = model
+        self.embed = embed
+        self.count_tokens = count_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.rows = {}
+        self.vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        if path and os.path.exists(os.path.join(path, "keys.json")):
+            with open(os.path.join(path, "keys.json"), "r") as file:
+                self.rows = {key: row for row, key in enumerate(json.load(file))}
+            self.vectors = np.load(os.path.join(path, "vectors.npy"))
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def batches(self, texts):
+        """
+        Groups texts into embed calls within the token and input budgets.
+        """
+        batch, tokens = [], 0
+        for text, text_tokens in zip(texts, self.count_tokens(texts)):
+            if batch and (tokens + text_tokens > self.max_batch_tokens or len(batch) >= self.max_batch_inputs):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += text_tokens
+        if batch:
+            yield batch
+
+    def get(self, texts):
+        keys = [self.key(text) for text in texts]
+        missing = list(dict.fromkeys(key for key in keys if key not in self.rows))
+        if missing:
+            by_key = dict(zip(keys, texts))
+            new_vectors = []
+            for batch in self.batches([by_key[key] for key in missing]):
+                new_vectors.extend(self.embed(batch))
+            start = len(self.vectors)
+            self.vectors = np.vstack([self.vectors, np.asarray(new_vectors, dtype=np.float32)])
+            self.rows.update({key: start + i for i, key in enumerate(missing)})
+            self.save()
+        return self.vectors[[self.rows[key] for key in keys]]
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, "vectors.npy"), self.vectors)
+        keys = [None] * len(self.rows)
+        for key, row in self.rows.items():
+            keys[row] = key
+        with open(os.path.join(self.path, "keys.json"), "w") as file:
+            json.dump(keys, file)
+
+def openai_embedder(model=EMBEDDING_MODEL):
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def embed(texts):
+        response = client.embeddings.create(input=[text.replace("\n", " ") for text in texts], model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return embed
+
+def hashed_embed(texts, dim=EMBEDDING_DIM):
+    """
+    Feature-hashed bag of words and word bigrams; a lexical stand-in for the
+    embedding model when no API access is available.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            vectors[row, digest % dim] += 1.0 if (digest >> 63) else -1.0
+    return normalize(vectors).tolist()
+
+def build_config(corpus, chunk_tokens, overlap_tokens, count_tokens, cache, path):
+    """
+    Chunks and embeds the corpus with one configuration into a local store.
+    Returns:
+        tuple: (store, chunk records as (paper, text, tokens), build stats)
+    """
+    start = time.perf_counter()
+    records = []
+    for paper, pages in corpus.items():
+        for chunk in stream_chunks(pages, chunk_tokens, overlap_tokens, count_tokens):
+            records.append((paper, chunk.text, chunk.token_count))
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = cache.get([text for _, text, _ in records])
+    embed_seconds = time.perf_counter() - start
+
+    ids = [f"paper_{i}#chunk_{i}" for i in range(len(records))]
+    store = QuantizedVectorStore.build(ids, vectors, path, mode="float32")
+    return store, records, {
+        "chunks": len(records),
+        "mean_chunk_tokens": float(np.mean([tokens for _, _, tokens in records])) if records else 0.0,
+        "chunk_seconds": chunk_seconds,
+        "embed_seconds": embed_seconds,
+    }
+
+def evaluate(store, records, queries, query_vectors, top_ks, context_chunks):
+    """
+    Runs every query once at the largest top_k and scores each top_k prefix.
+    """
+    max_k = max(top_ks)
+    latencies = []
+    rankings = []
+    if len(query_vectors):
+        store.search(query_vectors[0], max_k)  # warm-up, not timed
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results = store.search(vector, max_k)
+        latencies.append(time.perf_counter() - start)
+        rankings.append([int(vector_id.split("#chunk_")[1]) for vector_id, _ in results])
+    latencies = np.array(latencies) * 1000
+
+    report = {}
+    for k in top_ks:
+        hits, reciprocal_ranks, prompt_tokens, retrieved_tokens = 0, [], [], []
+        for item, ranking in zip(queries, rankings):
+            evidence = normalize_text(item["evidence"]) if item.get("evidence") else None
+            rank = next((position for position, row in enumerate(ranking[:k], 1)
+                         if records[row][0] == item["paper"]
+                         and (evidence is None or evidence in normalize_text(records[row][1]))), None)
+            hits += rank is not None
+            reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+            prompt_tokens.append(sum(records[row][2] for row in ranking[:min(k, context_chunks)]))
+            retrieved_tokens.append(sum(records[row][2] for row in ranking[:k]))
+        report[k] = {
+            "recall@k": hits / len(queries) if queries else 0.0,
+            "mrr@k": float(np.mean(reciprocal_ranks)) if queries else 0.0,
+            "prompt_tokens": float(np.mean(prompt_tokens)) if queries else 0.0,
+            "retrieved_tokens": float(np.mean(retrieved_tokens)) if queries else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if queries else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if queries else 0.0,
+        }
+    return report
+
+def print_report(report):
+    print(f"{'chunk':>6} {'overlap':>7} {'chunks':>7} {'top_k':>5} {'recall':>7} {'mrr':>6} "
+          f"{'prompt tok':>10} {'retr tok':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for config in report:
+        for k, entry in config["top_k"].items():
+            print(f"{config['chunk_tokens']:6d} {config['overlap_tokens']:7d} {config['chunks']:7d} {k:5d} "
+                  f"{entry['recall@k']:7.3f} {entry['mrr@k']:6.3f} {entry['prompt_tokens']:10.0f} "
+                  f"{entry['retrieved_tokens']:9.0f} {entry['latency_ms_p50']:7.2f} {entry['latency_ms_p95']:7.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency across chunk sizes and top_k.")
+    corpus_source = parser.add_mutually_exclusive_group(required=True)
+    corpus_source.add_argument("--text-dir", help="Directory of extracted paper texts")
+    corpus_source.add_argument("--pdf-dir", help="Directory of paper PDFs")
+    parser.add_argument("--queries", required=True, help="Labelled JSONL query set")
+    parser.add_argument("--limit", type=int, default=None, help="Papers in the corpus sample")
+    parser.add_argument("--chunk-tokens", nargs="+", type=int, default=[250, 500, 1000, 2000])
+    parser.add_argument("--overlap-ratio", type=float, default=0.125, help="Overlap as a fraction of the chunk size")
+    parser.add_argument("--top-k", nargs="+", type=int, default=[3, 5, 10, 20])
+    parser.add_argument("--context-chunks", type=int, default=3, help="Chunks placed in the prompt, as in /query")
+    parser.add_argument("--cache", default="embedding_cache", help="Embedding cache directory")
+    parser.add_argument("--hashed-embeddings", action="store_true", help="Use local feature hashing instead of OpenAI; implies --approximate-tokens")
+    parser.add_argument("--approximate-tokens", action="store_true", help="Count words instead of tiktoken tokens")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    # tiktoken downloads its vocabulary, so offline runs count words instead
+    offline = args.approximate_tokens or args.hashed_embeddings
+    count_tokens = approximate_token_counter if offline else get_token_counter()
+    model = "hashed" if args.hashed_embeddings else EMBEDDING_MODEL
+    if args.hashed_embeddings:
+        cache = EmbeddingCache(os.path.join(args.cache, model), model, hashed_embed, count_tokens)
+    else:
+        # Batches are sized with tiktoken even with --approximate-tokens, as
+        # that is what the embeddings API counts
+        cache = EmbeddingCache(os.path.join(args.cache, model), model, openai_embedder(), get_token_counter())
+
+    corpus = load_named_documents(args.pdf_dir, args.text_dir, args.limit)
+    queries = load_queries(args.queries, corpus)
+    query_vectors = cache.get([item["query"] for item in queries])
+    print(f"{len(corpus)} papers, {len(queries)} labelled queries, embeddings: {model}")
+
+    report = []
+    for chunk_tokens in args.chunk_tokens:
+        overlap_tokens = int(chunk_tokens * args.overlap_ratio)
+        with tempfile.TemporaryDirectory() as path:
+            store, records, build = build_config(corpus, chunk_tokens, overlap_tokens, count_tokens, cache, path)
+            scores = evaluate(store, records, queries, query_vectors, args.top_k, args.context_chunks)
+        report.append({"chunk_tokens": chunk_tokens, "overlap_tokens": overlap_tokens, **build, "top_k": scores})
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report saved to {args.output}")
@@ -0,0 +1,70 @@
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from vector_store import QuantizedVectorStore, STORE_MODES, normalize
+
+# Compares the local vector store modes against exact float32 search:
+# resident memory, query latency and recall@k.
+#
+#   python benchmark_vector_store.py --vectors embeddings.npy --queries 200
+# Without --vectors, clustered synthetic 1536-dim vectors are used.
+
+def synthetic_vectors(count, dim, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, count)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize(vectors)
+
+def benchmark(vectors, queries, top_k, rerank_factor, path):
+    ids = [f"paper_{i // 20}#chunk_{i % 20}" for i in range(len(vectors))]
+    exact = QuantizedVectorStore.build(ids, vectors, path, mode="float32")
+    truth = [set(vector_id for vector_id, _ in exact.search(query, top_k)) for query in queries]
+
+    report = {}
+    for mode in STORE_MODES:
+        store = exact if mode == "float32" else QuantizedVectorStore.load(path, mode, rerank_factor=rerank_factor)
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = store.search(query, top_k)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected.intersection(vector_id for vector_id, _ in results))
+        latencies = np.array(latencies) * 1000
+        report[mode] = {
+            "memory_mb": store.memory_bytes() / 2 ** 20,
+            "latency_ms_mean": float(latencies.mean()),
+            "latency_ms_p95": float(np.percentile(latencies, 95)),
+            f"recall@{top_k}": hits / (top_k * len(queries)),
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark quantized local vector search.")
+    parser.add_argument("--vectors", default=None, help=".npy file of embeddings")
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = normalize(np.load(args.vectors))
+    else:
+        vectors = synthetic_vectors(args.count, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed corpus vectors, like a question close to a chunk
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = normalize(vectors[picks] + 0.05 * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32))
+
+    with tempfile.TemporaryDirectory() as path:
+        report = benchmark(vectors, queries, args.top_k, args.rerank_factor, path)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries")
+    for mode, entry in report.items():
+        print(f"{mode:8s} memory {entry['memory_mb']:8.1f} MB  latency {entry['latency_ms_mean']:7.2f} ms "
+              f"(p95 {entry['latency_ms_p95']:7.2f})  recall@{args.top_k} {entry[f'recall@{args.top_k}']:.3f}")
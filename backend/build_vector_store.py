@@ -0,0 +1,41 @@
+import os
+import argparse
+import numpy as np
+
+from vector_store import QuantizedVectorStore
+
+# Exports every vector of the corpus namespace (CORPUS_NAMESPACE) into a
+# local vector store directory, used by app.py when LOCAL_VECTOR_STORE_PATH
+# is set.
+#
+#   python build_vector_store.py /data/vector_store
+
+def export_index(index, namespace="", batch_size=100):
+    """
+    Reads all ids and values of one namespace of the Pinecone index.
+    Returns:
+        tuple: (list of ids, float32 matrix of vectors)
+    """
+    ids = []
+    vectors = []
+    for id_page in index.list(namespace=namespace):
+        for i in range(0, len(id_page), batch_size):
+            batch = id_page[i:i + batch_size]
+            fetched = index.fetch(ids=batch, namespace=namespace).vectors
+            for vector_id in batch:
+                if vector_id in fetched:
+                    ids.append(vector_id)
+                    vectors.append(fetched[vector_id].values)
+        print(f"Exported {len(ids)} vectors")
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a local vector store from the Pinecone index.")
+    parser.add_argument("path", help="Output directory")
+    args = parser.parse_args()
+
+    from app import index, CORPUS_NAMESPACE
+
+    ids, vectors = export_index(index, CORPUS_NAMESPACE)
+    QuantizedVectorStore.build(ids, vectors, args.path)
+    print(f"Saved {len(ids)} vectors to {args.path} ({os.path.getsize(os.path.join(args.path, 'vectors.npy')) / 2 ** 20:.1f} MB)")
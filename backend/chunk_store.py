@@ -0,0 +1,191 @@
+import os
+import mmap
+import zlib
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+
+# Local store for chunk bodies, so vectors only carry ids and offsets.
+#
+# One file per paper, holding the zlib-compressed chunks and their offsets.
+# Files are written with the offsets in a footer, so chunks can be appended
+# as they are produced and each chunk's offset is final immediately:
+#   MAGIC2 | chunks | count + 1 absolute offsets (uint64) | chunk count (uint32)
+# Older files carry the offsets in a header instead:
+#   MAGIC | chunk count (uint32) | count + 1 absolute offsets (uint64) | chunks
+# Chunk i occupies bytes [offsets[i], offsets[i + 1]). Files are read through
+# mmap, so fetching one chunk touches only its own pages. Only the most
+# recently read max_open papers stay mapped, to bound open file descriptors.
+
+MAGIC = b"RLCHUNK1"
+MAGIC2 = b"RLCHUNK2"
+COUNT_FORMAT = "<I"
+HEADER_SIZE = len(MAGIC) + struct.calcsize(COUNT_FORMAT)
+COUNT_SIZE = struct.calcsize(COUNT_FORMAT)
+
+class ChunkWriter:
+    """
+    Appends the chunks of one paper to its blob as they are produced. The
+    blob becomes visible to readers only on close().
+    """
+
+    def __init__(self, store, paper_id):
+        self.store = store
+        self.paper_id = int(paper_id)
+        self.final_path = store.paper_path(paper_id)
+        self.temp_path = f"{self.final_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.offsets = array("Q")
+        self._file = open(self.temp_path, "wb")
+        self._file.write(MAGIC2)
+        self._position = len(MAGIC2)
+
+    def append(self, chunk):
+        """
+        Compresses and writes one chunk.
+        Returns:
+            tuple: (offset, length) of the chunk in the blob.
+        """
+        blob = zlib.compress(chunk.encode("utf-8"), self.store.compression_level)
+        offset = self._position
+        self._file.write(blob)
+        self.offsets.append(offset)
+        self._position += len(blob)
+        return offset, len(blob)
+
+    def close(self):
+        count = len(self.offsets)
+        self.offsets.append(self._position)
+        self._file.write(self.offsets.tobytes())
+        self._file.write(struct.pack(COUNT_FORMAT, count))
+        self._file.close()
+        # Rename, so readers never see a partial blob
+        os.replace(self.temp_path, self.final_path)
+        self.store.forget(self.paper_id)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+class ChunkStore:
+    def __init__(self, path, compression_level=6, max_open=256):
+        """
+        Args:
+            path (str): Directory holding one blob file per paper.
+            compression_level (int): zlib level used when writing.
+            max_open (int): Papers kept mapped; the least recently read are
+                unmapped beyond this.
+        """
+        self.path = path
+        self.compression_level = compression_level
+        self.max_open = max_open
+        self._maps = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+    def paper_path(self, paper_id):
+        return os.path.join(self.path, f"paper_{int(paper_id)}.chunks")
+
+    def has_paper(self, paper_id):
+        return os.path.exists(self.paper_path(paper_id))
+
+    def writer(self, paper_id):
+        """
+        Returns a ChunkWriter that streams the chunks of a paper to its blob.
+        """
+        return ChunkWriter(self, paper_id)
+
+    def write_paper(self, paper_id, chunks):
+        """
+        Compresses and stores all chunks of a paper.
+        Args:
+            paper_id (int): PaperID of the paper.
+            chunks (iterable): Chunk texts in order.
+        Returns:
+            List of (offset, length) of every compressed chunk in the blob.
+        """
+        writer = self.writer(paper_id)
+        try:
+            offsets = [writer.append(chunk) for chunk in chunks]
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return offsets
+
+    def forget(self, paper_id):
+        """
+        Drops the cached mapping of a paper, after its blob was rewritten.
+        """
+        with self._lock:
+            entry = self._maps.pop(int(paper_id), None)
+            if entry is not None:
+                entry[0].close()
+
+    def delete_paper(self, paper_id):
+        """
+        Removes a paper's blob, e.g. after its ingestion was rolled back.
+        """
+        self.forget(paper_id)
+        try:
+            os.remove(self.paper_path(paper_id))
+        except FileNotFoundError:
+            pass
+
+    def _open(self, paper_id):
+        """
+        Returns the mmap and offset index of a paper's blob, mapping it once.
+        Callers slice the mmap with the lock held, since an evicted map is
+        closed.
+        """
+        paper_id = int(paper_id)
+        with self._lock:
+            if paper_id in self._maps:
+                self._maps.move_to_end(paper_id)
+                return self._maps[paper_id]
+            with open(self.paper_path(paper_id), "rb") as file:
+                blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = array("Q")
+            if blob[:len(MAGIC2)] == MAGIC2:
+                count = struct.unpack_from(COUNT_FORMAT, blob, len(blob) - COUNT_SIZE)[0]
+                start = len(blob) - COUNT_SIZE - (count + 1) * offsets.itemsize
+                offsets.frombytes(blob[start:len(blob) - COUNT_SIZE])
+            elif blob[:len(MAGIC)] == MAGIC:
+                count = struct.unpack_from(COUNT_FORMAT, blob, len(MAGIC))[0]
+                offsets.frombytes(blob[HEADER_SIZE:HEADER_SIZE + (count + 1) * offsets.itemsize])
+            else:
+                blob.close()
+                raise ValueError(f"Corrupt chunk store file for paper {paper_id}")
+            self._maps[paper_id] = (blob, offsets)
+            while len(self._maps) > self.max_open:
+                _, (evicted, _) = self._maps.popitem(last=False)
+                evicted.close()
+            return self._maps[paper_id]
+
+    def chunk_count(self, paper_id):
+        return len(self._open(paper_id)[1]) - 1
+
+    def read_at(self, paper_id, offset, length):
+        """
+        Reads one chunk by the offset and length stored in its vector metadata.
+        """
+        with self._lock:
+            blob, _ = self._open(paper_id)
+            data = blob[offset:offset + length]
+        return zlib.decompress(data).decode("utf-8")
+
+    def read_chunk(self, paper_id, chunk_number):
+        """
+        Reads one chunk by its position in the paper.
+        """
+        _, offsets = self._open(paper_id)
+        return self.read_at(paper_id, offsets[chunk_number], offsets[chunk_number + 1] - offsets[chunk_number])
+
+    def read_paper(self, paper_id):
+        """
+        Returns every chunk of a paper, in order.
+        """
+        return [self.read_chunk(paper_id, i) for i in range(self.chunk_count(paper_id))]
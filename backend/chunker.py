@@ -0,0 +1,133 @@
+import re
+from collections import namedtuple
+
+# Streaming, token-aware chunker. Pages are consumed one at a time and split
+# into sentence segments; segments are packed into chunks by their real token
+# counts, and the trailing segments of each chunk (up to overlap_tokens) are
+# carried over to start the next one. Only the current chunk is buffered.
+
+DEFAULT_ENCODING = "cl100k_base"  # tokenizer of text-embedding-3-small
+
+# A segment runs up to and including the whitespace after a sentence end or
+# a blank line, so concatenating segments reproduces the page text exactly.
+SEGMENT_PATTERN = re.compile(r".*?(?:[.!?](?=\s)\s+|\n\s*\n\s*|$)", re.S)
+
+Chunk = namedtuple("Chunk", ["text", "token_count", "start_page", "start_char", "end_page", "end_char"])
+Segment = namedtuple("Segment", ["text", "token_count", "page", "start_char", "end_char"])
+
+_encodings = {}
+
+def get_token_counter(encoding_name=DEFAULT_ENCODING):
+    """
+    Returns a function mapping a list of strings to their token counts.
+    """
+    if encoding_name not in _encodings:
+        import tiktoken
+        _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+    encoding = _encodings[encoding_name]
+    return lambda texts: [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+def split_segments(page_text):
+    """
+    Splits a page into contiguous sentence segments.
+    Returns:
+        List of (text, start_char, end_char).
+    """
+    segments = []
+    for match in SEGMENT_PATTERN.finditer(page_text):
+        if match.end() > match.start():
+            segments.append((match.group(), match.start(), match.end()))
+    return segments
+
+def split_oversized(segment, chunk_tokens, count_tokens):
+    """
+    Breaks a segment longer than a chunk on word boundaries, falling back to
+    characters for a single overlong word.
+    """
+    pieces = []
+    words = re.findall(r"\S+\s*|\s+", segment.text)
+    word_tokens = count_tokens(words)
+    text, tokens, start = "", 0, segment.start_char
+    for word, count in zip(words, word_tokens):
+        if count > chunk_tokens:
+            # Rough character budget for a single overlong "word"
+            step = max(1, len(word) * chunk_tokens // count)
+            parts = [word[i:i + step] for i in range(0, len(word), step)]
+            part_counts = count_tokens(parts)
+        else:
+            parts, part_counts = [word], [count]
+        for part, part_count in zip(parts, part_counts):
+            if text and tokens + part_count > chunk_tokens:
+                pieces.append(Segment(text, tokens, segment.page, start, start + len(text)))
+                start += len(text)
+                text, tokens = "", 0
+            text += part
+            tokens += part_count
+    if text:
+        pieces.append(Segment(text, tokens, segment.page, start, start + len(text)))
+    return pieces
+
+def iter_segments(pages, chunk_tokens, count_tokens):
+    """
+    Yields token-counted segments of every page, in order.
+    """
+    for page_number, page_text in enumerate(pages):
+        spans = split_segments(page_text or "")
+        counts = count_tokens([text for text, _, _ in spans]) if spans else []
+        for (text, start, end), count in zip(spans, counts):
+            segment = Segment(text, count, page_number, start, end)
+            if count > chunk_tokens:
+                yield from split_oversized(segment, chunk_tokens, count_tokens)
+            else:
+                yield segment
+
+def make_chunk(segments):
+    return Chunk(
+        text="".join(segment.text for segment in segments),
+        token_count=sum(segment.token_count for segment in segments),
+        start_page=segments[0].page,
+        start_char=segments[0].start_char,
+        end_page=segments[-1].page,
+        end_char=segments[-1].end_char
+    )
+
+def stream_chunks(pages, chunk_tokens=1000, overlap_tokens=125, count_tokens=None):
+    """
+    Splits a stream of page texts into chunks of at most chunk_tokens tokens,
+    breaking at sentence boundaries where possible.
+    Args:
+        pages (iterable): Page texts, e.g. a generator over a PDF.
+        chunk_tokens (int): Maximum number of tokens per chunk.
+        overlap_tokens (int): Tokens of trailing segments repeated at the start
+            of the next chunk.
+        count_tokens (callable): Maps a list of strings to token counts;
+            defaults to the embedding model's tokenizer.
+    Yields:
+        Chunk: text, token count and the page/char offsets where it starts and ends.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    count_tokens = count_tokens or get_token_counter()
+
+    buffer = []
+    buffer_tokens = 0
+    for segment in iter_segments(pages, chunk_tokens, count_tokens):
+        if buffer and buffer_tokens + segment.token_count > chunk_tokens:
+            yield make_chunk(buffer)
+            # Keep the trailing segments that fit in the overlap budget
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(buffer):
+                if carried_tokens + previous.token_count > overlap_tokens:
+                    break
+                carried.append(previous)
+                carried_tokens += previous.token_count
+            buffer = carried[::-1]
+            buffer_tokens = carried_tokens
+            # Drop overlap that would not leave room for the new segment
+            while buffer and buffer_tokens + segment.token_count > chunk_tokens:
+                buffer_tokens -= buffer.pop(0).token_count
+        buffer.append(segment)
+        buffer_tokens += segment.token_count
+    if buffer:
+        yield make_chunk(buffer)
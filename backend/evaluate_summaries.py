@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+import fast_rouge
+
+# Offline summarization-quality evaluation.
+#
+# Input is a JSONL file with one item per line:
+#   {"paper_id": 12, "query": "...", "reference": "...", "summary": "..."}
+# "query" defaults to DEFAULT_QUERY. "reference" defaults to the sections
+# cached for the paper by /summarize with get_eval. "summary" is only used
+# when no --models are given, to score precomputed outputs.
+#
+# Example:
+#   python evaluate_summaries.py eval_set.jsonl --models llama3.2 llama3.3 gemini1.5 --workers 8
+
+DEFAULT_QUERY = "Summarize the content clearly and concisely with a maximum word limit of 300 words."
+
+def load_items(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def generate_for_item(item, model_type, top_k):
+    """
+    Runs retrieval and generate_answer for one item with one model backend.
+    Returns:
+        dict: The hypothesis, reference and generation latency, or an error.
+    """
+    # Imported lazily so scoring workers never initialise the API clients
+    from app import (get_embedding, search_ids, hydrate_matches, generate_answer,
+                     get_cached_generation, SECTIONS_PROMPT, CONTEXT_CHUNKS)
+
+    paper_id = item.get("paper_id")
+    query = item.get("query", DEFAULT_QUERY)
+    result = {"paper_id": paper_id, "model": model_type}
+    try:
+        reference = item.get("reference") or get_cached_generation(paper_id, "sections", prompt=SECTIONS_PROMPT)
+        if not reference:
+            result["error"] = "No reference available"
+            return result
+
+        # Only the chunks placed in the prompt are hydrated
+        matches = search_ids(get_embedding([query])[0], top_k, paper_id)
+        context = hydrate_matches(matches[:CONTEXT_CHUNKS], paper_id)
+        start = time.perf_counter()
+        # No hedging, so every answer really comes from model_type
+        answer = generate_answer(query, context, model_type, hedge=False)
+        result["latency"] = time.perf_counter() - start
+        result["hypothesis"] = answer
+        result["reference"] = reference
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def generate_all(items, models, concurrency, top_k):
+    """
+    Generates hypotheses for every (item, model) pair, one thread pool per model.
+    Returns:
+        tuple: (list of results, wall-clock seconds per model)
+    """
+    results = []
+    wall_times = {}
+    for model_type in models:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results.extend(executor.map(lambda item: generate_for_item(item, model_type, top_k), items))
+        wall_times[model_type] = time.perf_counter() - start
+        print(f"Generated {len(items)} answers with {model_type} in {wall_times[model_type]:.1f}s")
+    return results, wall_times
+
+def score_batch(pairs):
+    """
+    Scores a batch of (hypothesis, reference) pairs; runs in a worker process.
+    """
+    scores = []
+    for hyp, ref in pairs:
+        try:
+            scores.append(fast_rouge.score_pair(hyp, ref))
+        except ValueError as e:
+            scores.append({"error": str(e)})
+    return scores
+
+def score_all(pairs, workers, batch_size=32):
+    """
+    Scores all pairs in parallel worker processes.
+    Returns:
+        tuple: (list of score dicts in input order, elapsed seconds)
+    """
+    batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        scores = [score for batch in executor.map(score_batch, batches) for score in batch]
+    return scores, time.perf_counter() - start
+
+def check_against_rouge(pairs, scores, sample):
+    """
+    Compares fast_rouge scores with the `rouge` package used by /summarize.
+    Returns:
+        float: Largest absolute difference over the checked pairs.
+    """
+    from rouge import Rouge
+
+    rouge = Rouge()
+    max_diff = 0.0
+    for (hyp, ref), score in list(zip(pairs, scores))[:sample]:
+        if "error" in score:
+            continue
+        expected = rouge.get_scores(hyp, ref)[0]
+        for metric in fast_rouge.ROUGE_METRICS:
+            for stat in fast_rouge.ROUGE_STATS:
+                max_diff = max(max_diff, abs(expected[metric][stat] - score[metric][stat]))
+    return max_diff
+
+def summarize_results(results, scores, wall_times):
+    """
+    Aggregates quality and latency numbers per model.
+    """
+    report = {}
+    for model_type in dict.fromkeys(result["model"] for result in results):
+        model_results = [(result, score) for result, score in zip(results, scores) if result["model"] == model_type]
+        scored = [score for _, score in model_results if score and "error" not in score]
+        latencies = np.array([result["latency"] for result, _ in model_results if "latency" in result])
+
+        entry = {
+            "items": len(model_results),
+            "errors": len(model_results) - len(scored),
+        }
+        for metric in fast_rouge.ROUGE_METRICS:
+            for stat in fast_rouge.ROUGE_STATS:
+                values = [score[metric][stat] for score in scored]
+                entry[f"{metric}-{stat}"] = float(np.mean(values)) if values else None
+        if latencies.size:
+            entry["latency_mean"] = float(latencies.mean())
+            entry["latency_p50"] = float(np.percentile(latencies, 50))
+            entry["latency_p95"] = float(np.percentile(latencies, 95))
+        if model_type in wall_times:
+            entry["answers_per_sec"] = len(model_results) / wall_times[model_type]
+        report[model_type] = entry
+    return report
+
+def print_report(report):
+    columns = ["items", "errors", "rouge-1-f", "rouge-2-f", "rouge-l-f", "latency_p50", "latency_p95", "answers_per_sec"]
+    print("model".ljust(14) + "".join(column.rjust(16) for column in columns))
+    for model_type, entry in report.items():
+        cells = []
+        for column in columns:
+            value = entry.get(column)
+            cells.append(("-" if value is None else f"{value:.4f}" if isinstance(value, float) else str(value)).rjust(16))
+        print(model_type.ljust(14) + "".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch ROUGE evaluation of summaries and model backends.")
+    parser.add_argument("dataset", help="JSONL file of evaluation items")
+    parser.add_argument("--models", nargs="*", default=[], help="generate_answer backends to compare, e.g. llama3.2 llama3.3 gemini1.5")
+    parser.add_argument("--concurrency", type=int, default=4, help="In-flight generations per model")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--check-sample", type=int, default=20, help="Pairs re-scored with the rouge package, 0 to skip")
+    parser.add_argument("--output", default=None, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    items = load_items(args.dataset)
+    if args.models:
+        results, wall_times = generate_all(items, args.models, args.concurrency, args.top_k)
+    else:
+        results = [{"paper_id": item.get("paper_id"), "model": "precomputed",
+                    "hypothesis": item.get("summary"), "reference": item.get("reference")} for item in items]
+        wall_times = {}
+
+    scorable = [i for i, result in enumerate(results) if result.get("hypothesis") and result.get("reference")]
+    pairs = [(results[i]["hypothesis"], results[i]["reference"]) for i in scorable]
+    pair_scores, scoring_time = score_all(pairs, args.workers)
+    scores = [None] * len(results)
+    for i, score in zip(scorable, pair_scores):
+        scores[i] = score
+
+    report = {
+        "models": summarize_results(results, scores, wall_times),
+        "scoring": {
+            "pairs": len(pairs),
+            "seconds": scoring_time,
+            "pairs_per_sec": len(pairs) / scoring_time if scoring_time else None,
+            "workers": args.workers,
+        },
+    }
+    if args.check_sample and pairs:
+        report["scoring"]["max_diff_vs_rouge"] = check_against_rouge(pairs, pair_scores, args.check_sample)
+
+    print_report(report["models"])
+    print(f"Scored {len(pairs)} pairs in {scoring_time:.2f}s with {args.workers} workers")
+    if "max_diff_vs_rouge" in report["scoring"]:
+        print(f"Max difference vs rouge package: {report['scoring']['max_diff_vs_rouge']:.2e}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"report": report, "results": results, "scores": scores}, file, indent=2)
+        print(f"Report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
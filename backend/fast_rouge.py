@@ -0,0 +1,171 @@
+import numpy as np
+
+# Vectorized re-implementation of the `rouge` package (rouge==1.0.1) scores.
+# Tokenization, set-based n-gram counting and the summary-level LCS union
+# (including its backtracking tie-break) follow the package exactly, so the
+# scores match `Rouge().get_scores` while words are handled as integer ids.
+
+ROUGE_METRICS = ["rouge-1", "rouge-2", "rouge-l"]
+ROUGE_STATS = ["f", "p", "r"]
+
+def split_sentences(text):
+    """
+    Splits text into whitespace-normalised sentences the way `rouge` does.
+    Args:
+        text (str): Hypothesis or reference text.
+    Returns:
+        List of sentences.
+    """
+    return [" ".join(_.split()) for _ in text.split(".") if len(_) > 0]
+
+def encode_sentences(sentences, vocab):
+    """
+    Maps every word of every sentence to an integer id.
+    Args:
+        sentences (list): Sentences from split_sentences.
+        vocab (dict): Word to id mapping, extended in place.
+    Returns:
+        List of int64 arrays, one per sentence.
+    """
+    encoded = []
+    for sentence in sentences:
+        ids = [vocab.setdefault(word, len(vocab)) for word in sentence.split(" ")]
+        encoded.append(np.asarray(ids, dtype=np.int64))
+    return encoded
+
+def ngram_keys(ids, n, vocab_size):
+    """
+    Packs every n-gram of an id sequence into a single int64 key.
+    Returns:
+        Sorted array of the distinct n-gram keys.
+    """
+    count = len(ids) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    keys = ids[:count].copy()
+    for offset in range(1, n):
+        keys = keys * vocab_size + ids[offset:offset + count]
+    return np.unique(keys)
+
+def f_r_p(overlap, evaluated_count, reference_count):
+    precision = overlap / evaluated_count if evaluated_count else 0.0
+    recall = overlap / reference_count if reference_count else 0.0
+    f1_score = 2.0 * ((precision * recall) / (precision + recall + 1e-8))
+    return {"f": f1_score, "p": precision, "r": recall}
+
+def rouge_n(hyp_ids, ref_ids, n, vocab_size):
+    evaluated = ngram_keys(hyp_ids, n, vocab_size)
+    reference = ngram_keys(ref_ids, n, vocab_size)
+    overlap = np.intersect1d(evaluated, reference, assume_unique=True).size
+    return f_r_p(overlap, evaluated.size, reference.size)
+
+def pad_sentences(sentences):
+    """
+    Stacks id sequences into one -1 padded matrix.
+    Returns:
+        tuple: (padded matrix, array of sentence lengths)
+    """
+    lengths = np.array([len(sentence) for sentence in sentences])
+    padded = np.full((len(sentences), lengths.max()), -1, dtype=np.int64)
+    for row, sentence in enumerate(sentences):
+        padded[row, :len(sentence)] = sentence
+    return padded, lengths
+
+def lcs_words(x, hyp_padded, hyp_lengths):
+    """
+    Returns the word ids on the LCS of x with each hypothesis sentence,
+    reconstructed with the same tie-break as `rouge`. The DP tables of all
+    hypothesis sentences are filled together, one vectorized pass per row:
+    row[j] is the running maximum over k <= j of max(up[k], match * (diag + 1)).
+    Args:
+        x (np.ndarray): Reference sentence ids.
+        hyp_padded (np.ndarray): Hypothesis sentences, -1 padded.
+        hyp_lengths (np.ndarray): Length of each hypothesis sentence.
+    Returns:
+        set: Union of the word ids on the reconstructed LCSs.
+    """
+    equal = x[None, :, None] == hyp_padded[:, None, :]
+    if not equal.any():
+        return set()
+
+    count, width = hyp_padded.shape
+    table = np.zeros((count, len(x) + 1, width + 1), dtype=np.int32)
+    for i in range(1, len(x) + 1):
+        previous = table[:, i - 1]
+        candidates = np.maximum(previous[:, 1:], np.where(equal[:, i - 1], previous[:, :-1] + 1, 0))
+        table[:, i, 1:] = np.maximum.accumulate(candidates, axis=1)
+
+    words = set()
+    for sentence in np.flatnonzero(table[:, len(x)].max(axis=1)):
+        i, j = len(x), int(hyp_lengths[sentence])
+        sentence_equal = equal[sentence]
+        sentence_table = table[sentence]
+        while i > 0 and j > 0:
+            if sentence_equal[i - 1, j - 1]:
+                words.add(int(x[i - 1]))
+                i -= 1
+                j -= 1
+            elif sentence_table[i - 1, j] > sentence_table[i, j - 1]:
+                i -= 1
+            else:
+                j -= 1
+    return words
+
+def rouge_l_summary_level(hyp_sentences, ref_sentences, hyp_ids, ref_ids):
+    hyp_padded, hyp_lengths = pad_sentences(hyp_sentences)
+    union = set()
+    for ref_s in ref_sentences:
+        union |= lcs_words(ref_s, hyp_padded, hyp_lengths)
+    llcs = len(union)
+    r_lcs = llcs / np.unique(ref_ids).size
+    p_lcs = llcs / np.unique(hyp_ids).size
+    f_lcs = 2.0 * ((p_lcs * r_lcs) / (p_lcs + r_lcs + 1e-8))
+    return {"f": f_lcs, "p": p_lcs, "r": r_lcs}
+
+def score_pair(hyp, ref):
+    """
+    Computes ROUGE-1, ROUGE-2 and ROUGE-L for one (hypothesis, reference) pair.
+    Raises:
+        ValueError: If either text has no sentences, like `rouge` does.
+    """
+    hyp_sentences = split_sentences(hyp)
+    ref_sentences = split_sentences(ref)
+    if len(hyp_sentences) <= 0:
+        raise ValueError("Hypothesis is empty.")
+    if len(ref_sentences) <= 0:
+        raise ValueError("Reference is empty.")
+
+    vocab = {}
+    hyp_encoded = encode_sentences(hyp_sentences, vocab)
+    ref_encoded = encode_sentences(ref_sentences, vocab)
+    hyp_ids = np.concatenate(hyp_encoded)
+    ref_ids = np.concatenate(ref_encoded)
+    vocab_size = max(len(vocab), 1)
+
+    return {
+        "rouge-1": rouge_n(hyp_ids, ref_ids, 1, vocab_size),
+        "rouge-2": rouge_n(hyp_ids, ref_ids, 2, vocab_size),
+        "rouge-l": rouge_l_summary_level(hyp_encoded, ref_encoded, hyp_ids, ref_ids),
+    }
+
+def get_scores(hyps, refs, avg=False):
+    """
+    Drop-in replacement for `Rouge().get_scores`.
+    Args:
+        hyps (str or list): Hypothesis text(s).
+        refs (str or list): Reference text(s).
+        avg (bool): Average the scores over all pairs.
+    Returns:
+        A list of per-pair score dicts, or one averaged dict if avg is set.
+    """
+    if isinstance(hyps, str):
+        hyps, refs = [hyps], [refs]
+    assert len(hyps) == len(refs)
+
+    scores = [score_pair(hyp, ref) for hyp, ref in zip(hyps, refs)]
+    if not avg:
+        return scores
+    return {
+        metric: {stat: sum(score[metric][stat] for score in scores) / len(scores) for stat in ROUGE_STATS}
+        for metric in ROUGE_METRICS
+    }
@@ -0,0 +1,146 @@
+import time
+import queue
+import threading
+
+from chunker import stream_chunks
+
+# Streaming ingestion of one paper with bounded memory. Three stages run
+# concurrently and hand work over through bounded queues:
+#   pages -> chunks (written to the chunk store) -> embedding batches -> upserts
+# At any time only a few embedding batches and the upserts in flight are
+# held in memory, however long the document is.
+
+_DONE = object()
+
+class PipelineStopped(Exception):
+    """
+    Raised inside a stage when another stage failed.
+    """
+
+def _put(work_queue, item, stop):
+    while True:
+        if stop.is_set():
+            raise PipelineStopped()
+        try:
+            work_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+def _get(work_queue, stop):
+    while True:
+        if stop.is_set():
+            raise PipelineStopped()
+        try:
+            return work_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+def ingest_paper(pages, paper_id, chunk_writer, embed, upserter, chunk_tokens=1000, overlap_tokens=125,
+                 embed_batch_size=64, queue_size=2, count_tokens=None):
+    """
+    Chunks, stores, embeds and upserts a paper as a stream.
+    Args:
+        pages (iterable): Page texts, e.g. a generator over a PDF.
+        paper_id (int): PaperID of the paper.
+        chunk_writer (ChunkWriter): Receives the chunk texts; closed on success
+            and aborted on failure.
+        embed (callable): Maps a list of texts to their embeddings.
+        upserter (ParallelUpserter): Sends the vector records.
+        embed_batch_size (int): Chunks per embedding call.
+        queue_size (int): Batches buffered between two stages.
+        count_tokens (callable): Token counter passed to the chunker.
+    Returns:
+        dict: Counts of pages, chunks and tokens, the upsert stats and timings.
+    """
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    record_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    stats = {"pages": 0, "chunks": 0, "tokens": 0}
+    start = time.perf_counter()
+
+    def counted(pages):
+        for page in pages:
+            stats["pages"] += 1
+            yield page
+
+    def chunk_stage():
+        try:
+            batch = []
+            for chunk in stream_chunks(counted(pages), chunk_tokens, overlap_tokens, count_tokens):
+                offset, length = chunk_writer.append(chunk.text)
+                batch.append((stats["chunks"], chunk, offset, length))
+                stats["chunks"] += 1
+                stats["tokens"] += chunk.token_count
+                if len(batch) >= embed_batch_size:
+                    _put(chunk_queue, batch, stop)
+                    batch = []
+            if batch:
+                _put(chunk_queue, batch, stop)
+            _put(chunk_queue, _DONE, stop)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def embed_stage():
+        try:
+            while True:
+                batch = _get(chunk_queue, stop)
+                if batch is _DONE:
+                    break
+                embeddings = embed([chunk.text for _, chunk, _, _ in batch])
+                records = []
+                for (number, chunk, offset, length), embedding in zip(batch, embeddings):
+                    records.append({
+                        "id": f"paper_{paper_id}#chunk_{number}",
+                        "values": embedding,
+                        "metadata": {
+                            "paper_id": f"paper_{paper_id}",
+                            "chunk_id": f"chunk_{number}",
+                            "chunk_offset": offset,
+                            "chunk_length": length,
+                            "start_page": chunk.start_page,
+                            "start_char": chunk.start_char,
+                            "end_page": chunk.end_page,
+                            "end_char": chunk.end_char
+                        }
+                    })
+                _put(record_queue, records, stop)
+            _put(record_queue, _DONE, stop)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def records():
+        while True:
+            batch = _get(record_queue, stop)
+            if batch is _DONE:
+                return
+            yield from batch
+
+    stages = [threading.Thread(target=chunk_stage, name="ingest-chunk", daemon=True),
+              threading.Thread(target=embed_stage, name="ingest-embed", daemon=True)]
+    for stage in stages:
+        stage.start()
+    try:
+        stats["upsert"] = upserter.upsert(records())
+    except BaseException as e:
+        # PipelineStopped only means a stage failed; report the stage's error
+        if not isinstance(e, PipelineStopped):
+            errors.append(e)
+    finally:
+        # Stages have finished on success; on failure this unblocks them
+        stop.set()
+        for stage in stages:
+            stage.join()
+    if errors:
+        chunk_writer.abort()
+        raise errors[0]
+    chunk_writer.close()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
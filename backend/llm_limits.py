@@ -0,0 +1,274 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Request coalescing, per-provider admission control and hedging for LLM calls.
+
+class ProviderBusyError(Exception):
+    """
+    Raised when a provider's wait queue is full or a caller waited too long.
+    """
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: the first caller for a key runs the
+    call and every caller arriving before it finishes gets the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight_keys": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+class ProviderLimiter:
+    """
+    Bounds the calls in flight to one provider. Callers beyond the limit wait
+    in a bounded queue; when the queue is full, or a caller has waited
+    queue_timeout seconds, ProviderBusyError is raised.
+    """
+
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout=30.0):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def run(self, fn):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ProviderBusyError(f"{self.name} queue is full ({self.max_queue} waiting)")
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.queued -= 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.calls += 1
+                self.in_flight += 1
+        if not acquired:
+            raise ProviderBusyError(f"{self.name} did not free a slot within {self.queue_timeout}s")
+
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            admitted = self.calls
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "peak_queued": self.peak_queued,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.total_wait * 1000 / admitted if admitted else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies for one provider.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def percentile(self, percentile):
+        """
+        Returns the given latency percentile in seconds, or None while the
+        window holds fewer than min_samples calls.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        position = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[position]
+
+    def stats(self):
+        with self._lock:
+            samples = len(self._latencies)
+            errors = self.errors
+        stats = {"samples": samples, "errors": errors}
+        for percentile in (50, 95, 99):
+            value = self.percentile(percentile)
+            stats[f"p{percentile}_ms"] = value * 1000 if value is not None else None
+        return stats
+
+class Hedger:
+    """
+    Hedged calls across providers. The primary provider is called first; if
+    it has not answered within its own latency percentile (or it fails), the
+    backup provider is called too and whichever succeeds first wins. The
+    losing call is left to finish in the background.
+    """
+
+    def __init__(self, backups, percentile=95.0, default_delay=4.0, min_delay=0.25, max_workers=64,
+                 window=200, min_samples=20):
+        """
+        Args:
+            backups (dict): Provider name -> backup provider name.
+            percentile (float): Latency percentile of the primary that triggers the hedge.
+            default_delay (float): Hedge delay in seconds until enough latencies are known.
+            min_delay (float): Lower bound of the hedge delay in seconds.
+            max_workers (int): Threads available for in-flight calls.
+        """
+        self.backups = backups
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.trackers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.calls = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self.backup_wins = 0
+
+    def tracker(self, provider):
+        with self._lock:
+            if provider not in self.trackers:
+                self.trackers[provider] = LatencyTracker(self.window, self.min_samples)
+            return self.trackers[provider]
+
+    def hedge_delay(self, provider):
+        latency = self.tracker(provider).percentile(self.percentile)
+        if latency is None:
+            return self.default_delay
+        return max(self.min_delay, latency)
+
+    def _timed(self, provider, fn):
+        start = time.perf_counter()
+        try:
+            result = fn(provider)
+        except Exception:
+            self.tracker(provider).record_error()
+            raise
+        self.tracker(provider).record(time.perf_counter() - start)
+        return result
+
+    def call(self, provider, fn):
+        """
+        Runs fn(provider_name) with hedging.
+        Args:
+            provider (str): Primary provider.
+            fn (callable): Performs the call for a given provider name.
+        Returns:
+            The result of the first call to succeed.
+        """
+        with self._lock:
+            self.calls += 1
+        backup = self.backups.get(provider)
+        if not backup:
+            return self._timed(provider, fn)
+
+        pending = {self._executor.submit(self._timed, provider, fn): provider}
+        done, _ = wait(pending, timeout=self.hedge_delay(provider))
+        backup_started = False
+        if not done:
+            with self._lock:
+                self.hedged += 1
+            pending[self._executor.submit(self._timed, backup, fn)] = backup
+            backup_started = True
+
+        last_error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"{name} call failed: {e}")
+                    last_error = e
+                    continue
+                if name != provider:
+                    with self._lock:
+                        self.backup_wins += 1
+                return result
+            if not backup_started:
+                # The primary failed before the hedge delay: fall back now
+                with self._lock:
+                    self.fallbacks += 1
+                pending[self._executor.submit(self._timed, backup, fn)] = backup
+                backup_started = True
+        raise last_error
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "fallbacks": self.fallbacks,
+                "backup_wins": self.backup_wins,
+                "backups": dict(self.backups),
+            }
+            providers = list(self.trackers)
+        stats["latency"] = {provider: self.tracker(provider).stats() for provider in providers}
+        stats["hedge_delay_ms"] = {provider: self.hedge_delay(provider) * 1000 for provider in providers}
+        return stats
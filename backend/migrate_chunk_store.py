@@ -0,0 +1,88 @@
+import argparse
+from collections import defaultdict
+
+from chunk_store import ChunkStore
+
+# Moves chunk bodies of the corpus namespace (CORPUS_NAMESPACE) out of
+# Pinecone metadata into the local chunk store.
+# For every paper the chunks are written to one blob, then each vector's
+# metadata is updated with its offsets and the "chunk" text is cleared.
+#
+#   python migrate_chunk_store.py /data/chunk_store [--dry-run]
+
+def chunk_number(vector_id):
+    return int(vector_id.split("#chunk_")[1])
+
+def collect_papers(index, namespace=None):
+    """
+    Groups every vector id of the index (or of one namespace) by paper.
+    Returns:
+        dict: paper number -> list of vector ids sorted by chunk number.
+    """
+    papers = defaultdict(list)
+    for id_page in (index.list(namespace=namespace) if namespace is not None else index.list()):
+        for vector_id in id_page:
+            papers[int(vector_id.split("#")[0].split("_")[1])].append(vector_id)
+    for vector_ids in papers.values():
+        vector_ids.sort(key=chunk_number)
+    return papers
+
+def migrate_paper(index, store, paper_id, vector_ids, dry_run=False, batch_size=100, namespace=""):
+    """
+    Copies one paper's chunk texts to the store and points its vectors at them.
+    Safe to re-run: text that an earlier run already moved is read from the
+    existing blob, and no metadata is cleared before the new blob reads back.
+    Returns:
+        int: Number of vectors migrated, 0 if the paper was already migrated.
+    """
+    metadata = {}
+    for i in range(0, len(vector_ids), batch_size):
+        fetched = index.fetch(ids=vector_ids[i:i + batch_size], namespace=namespace).vectors
+        for vector_id, vector in fetched.items():
+            metadata[vector_id] = vector.metadata or {}
+    items = [metadata.get(vector_id, {}) for vector_id in vector_ids]
+    if store.has_paper(paper_id) and all(not item.get("chunk") and "chunk_offset" in item for item in items):
+        return 0
+
+    # A previous run may have failed after clearing the text of some vectors;
+    # their text is read back from the blob that run wrote
+    chunks = []
+    for vector_id, item in zip(vector_ids, items):
+        if item.get("chunk"):
+            chunks.append(item["chunk"])
+        elif "chunk_offset" in item and store.has_paper(paper_id):
+            chunks.append(store.read_at(paper_id, int(item["chunk_offset"]), int(item["chunk_length"])))
+        else:
+            raise ValueError(f"No chunk text for {vector_id} in metadata or the chunk store")
+    if dry_run:
+        return len(vector_ids)
+
+    # Chunk numbers are contiguous from 0 for ingested papers
+    offsets = store.write_paper(paper_id, chunks)
+    for chunk, (offset, length) in zip(chunks, offsets):
+        if store.read_at(paper_id, offset, length) != chunk:
+            raise ValueError(f"Chunk store blob for paper {paper_id} does not read back")
+    for vector_id, (offset, length) in zip(vector_ids, offsets):
+        index.update(id=vector_id, set_metadata={"chunk": "", "chunk_offset": offset, "chunk_length": length},
+                     namespace=namespace)
+    return len(vector_ids)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move chunk text from Pinecone metadata to the local chunk store.")
+    parser.add_argument("path", help="Chunk store directory, the CHUNK_STORE_PATH of the backend")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app import index, CORPUS_NAMESPACE
+
+    store = ChunkStore(args.path)
+    papers = collect_papers(index, CORPUS_NAMESPACE)
+    migrated = 0
+    for done, (paper_id, vector_ids) in enumerate(sorted(papers.items()), 1):
+        try:
+            migrated += migrate_paper(index, store, paper_id, vector_ids, args.dry_run, namespace=CORPUS_NAMESPACE)
+        except Exception as e:
+            print(f"Error migrating paper {paper_id}: {e}")
+        if done % 100 == 0:
+            print(f"{done}/{len(papers)} papers, {migrated} vectors migrated")
+    print(f"Migrated {migrated} vectors from {len(papers)} papers")
@@ -0,0 +1,82 @@
+import json
+import argparse
+
+from migrate_chunk_store import collect_papers
+from paper_namespaces import paper_namespace
+from vector_upsert import ParallelUpserter
+
+# Moves user-uploaded papers out of the shared corpus namespace into one
+# namespace per paper. Papers listed in pdf_metadata.json are the corpus and
+# stay where they are. Each paper is copied, the copy is verified by
+# fetching every id from the new namespace, and only then are the source
+# vectors deleted.
+#
+#   python migrate_namespaces.py [--dry-run] [--keep-source] [--papers 2701 2702]
+
+def load_corpus_ids(path):
+    with open(path, "r") as file:
+        return {int(metadata[0]) for metadata in json.load(file).values()}
+
+def fetch_records(index, vector_ids, namespace, batch_size=100):
+    """
+    Fetches full vector records (id, values, metadata) in id order.
+    """
+    records = []
+    for i in range(0, len(vector_ids), batch_size):
+        fetched = index.fetch(ids=vector_ids[i:i + batch_size], namespace=namespace).vectors
+        for vector_id in vector_ids[i:i + batch_size]:
+            if vector_id in fetched:
+                vector = fetched[vector_id]
+                records.append({"id": vector_id, "values": list(vector.values), "metadata": dict(vector.metadata or {})})
+    return records
+
+def count_present(index, vector_ids, namespace, batch_size=100):
+    return sum(len(index.fetch(ids=vector_ids[i:i + batch_size], namespace=namespace).vectors)
+               for i in range(0, len(vector_ids), batch_size))
+
+def migrate_paper(index, paper_id, vector_ids, source_namespace, keep_source=False, dry_run=False):
+    """
+    Copies one paper into its own namespace and removes it from the source.
+    Returns:
+        dict: Vectors copied and upsert throughput.
+    """
+    target = paper_namespace(paper_id)
+    if dry_run:
+        return {"vectors": len(vector_ids), "vectors_per_sec": 0.0}
+    records = fetch_records(index, vector_ids, source_namespace)
+    stats = ParallelUpserter(index, namespace=target).upsert(records)
+
+    present = count_present(index, vector_ids, target)
+    if present != len(records):
+        raise RuntimeError(f"only {present} of {len(records)} vectors visible in {target}, source kept")
+    if not keep_source:
+        for i in range(0, len(vector_ids), 1000):
+            index.delete(ids=vector_ids[i:i + 1000], namespace=source_namespace)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move uploaded papers into one Pinecone namespace per paper.")
+    parser.add_argument("--corpus-metadata", default="pdf_metadata.json", help="Papers listed here stay in the corpus namespace")
+    parser.add_argument("--papers", nargs="*", type=int, help="Only migrate these PaperIDs")
+    parser.add_argument("--keep-source", action="store_true", help="Leave the vectors in the corpus namespace too")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app import index, CORPUS_NAMESPACE
+
+    corpus_ids = load_corpus_ids(args.corpus_metadata)
+    papers = collect_papers(index, CORPUS_NAMESPACE)
+    selected = sorted(paper_id for paper_id in papers
+                      if paper_id not in corpus_ids and (not args.papers or paper_id in args.papers))
+    print(f"{len(selected)} uploaded papers to migrate out of {len(papers)} in the corpus namespace")
+
+    migrated = 0
+    for paper_id in selected:
+        try:
+            stats = migrate_paper(index, paper_id, papers[paper_id], CORPUS_NAMESPACE, args.keep_source, args.dry_run)
+            migrated += stats["vectors"]
+            print(f"paper {paper_id}: {stats['vectors']} vectors -> {paper_namespace(paper_id)} "
+                  f"({stats['vectors_per_sec']:.0f} vectors/s)")
+        except Exception as e:
+            print(f"Error migrating paper {paper_id}: {e}")
+    print(f"Migrated {migrated} vectors from {len(selected)} papers")
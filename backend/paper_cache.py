@@ -0,0 +1,153 @@
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from llm_limits import SingleFlight
+
+# In-process working set of the papers being queried on the notebook page.
+# The first /query with a file_id loads every chunk vector and chunk text of
+# that paper; follow-up questions are ranked with an exact dot product in
+# memory instead of a filtered search over the whole index. Entries are
+# evicted least-recently-used beyond max_bytes, and after idle_seconds unused.
+
+class PaperWorkingSet:
+    def __init__(self, paper_id, ids, vectors, metadatas):
+        """
+        Args:
+            paper_id (int): PaperID of the paper.
+            ids (list): Vector ids, one per chunk.
+            vectors (array): Chunk embeddings, shape (chunks, dimension).
+            metadatas (list): Vector metadata per chunk, with the chunk text
+                under "chunk".
+        """
+        self.paper_id = paper_id
+        self.ids = list(ids)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+        self.metadatas = metadatas
+        self.last_used = time.monotonic()
+        self.nbytes = self.vectors.nbytes + sum(len(metadata.get("chunk", "")) for metadata in metadatas) + 100 * len(self.ids)
+
+    def search_batch(self, queries, top_k=10):
+        """
+        Exact cosine search of many queries against the paper's chunks.
+        Returns:
+            List of {"matches": [...]} in the shape of index.query, per query.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.vectors.T
+        top_k = min(top_k, len(self.ids))
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, top_k - 1)[:top_k] if top_k < len(row) else np.arange(len(row))
+            top = top[np.argsort(-row[top], kind="stable")]
+            results.append({"matches": [
+                {"id": self.ids[i], "score": float(row[i]), "metadata": self.metadatas[i]} for i in top
+            ]})
+        return results
+
+    def search(self, query, top_k=10):
+        return self.search_batch([query], top_k)[0]
+
+class PaperCache:
+    def __init__(self, loader, max_bytes=256 * 1024 * 1024, idle_seconds=1800.0):
+        """
+        Args:
+            loader (callable): paper_id -> PaperWorkingSet, or None when the
+                paper has no vectors.
+            max_bytes (int): Total size of the cached working sets.
+            idle_seconds (float): Entries unused for longer are dropped.
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        # Bumped by invalidate(), so loads started before it are not cached
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, paper_id):
+        """
+        Returns the working set of a paper, loading it on a miss. Concurrent
+        misses for the same paper share one load.
+        """
+        paper_id = int(paper_id)
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(paper_id)
+            if entry is not None:
+                self._entries.move_to_end(paper_id)
+                entry.last_used = time.monotonic()
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generations.get(paper_id, 0)
+        entry = self._loads.do((paper_id, generation), lambda: self._load(paper_id, generation))
+        if entry is not None:
+            entry.last_used = time.monotonic()
+        return entry
+
+    def _load(self, paper_id, generation):
+        entry = self.loader(paper_id)
+        if entry is None or not entry.ids or entry.nbytes > self.max_bytes:
+            return entry
+        with self._lock:
+            if self._generations.get(paper_id, 0) != generation:
+                # Invalidated while loading, e.g. by an upsert in progress
+                return entry
+            previous = self._entries.pop(paper_id, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self._entries[paper_id] = entry
+            self.bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def _evict(self):
+        """
+        Drops idle entries, then least recently used ones beyond max_bytes;
+        called with the lock held.
+        """
+        now = time.monotonic()
+        # Entries are kept in order of last use, so idle ones are at the front
+        while self._entries and now - next(iter(self._entries.values())).last_used > self.idle_seconds:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.nbytes
+            self.evictions += 1
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.nbytes
+            self.evictions += 1
+
+    def invalidate(self, paper_id):
+        """
+        Drops a paper's working set; loads already running are not cached.
+        """
+        paper_id = int(paper_id)
+        with self._lock:
+            self._generations[paper_id] = self._generations.get(paper_id, 0) + 1
+            entry = self._entries.pop(paper_id, None)
+            if entry is not None:
+                self.bytes -= entry.nbytes
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            return {
+                "papers": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,65 @@
+import time
+import threading
+
+# Namespace-per-paper layout for user uploads. The preloaded corpus stays in
+# the shared corpus namespace; every uploaded paper gets its own namespace,
+# so a notebook query scans only that paper's vectors instead of filtering
+# the whole index by metadata.
+
+UPLOAD_NAMESPACE_PREFIX = "paper_"
+
+def paper_namespace(paper_id):
+    return f"{UPLOAD_NAMESPACE_PREFIX}{int(paper_id)}"
+
+class NamespaceDirectory:
+    """
+    Tracks which papers live in their own namespace. The set is read from the
+    index stats at startup and extended on upload; a paper that is not known
+    triggers a rate-limited refresh, so uploads made by other instances are
+    picked up.
+    """
+
+    def __init__(self, index, refresh_seconds=30.0):
+        self.index = index
+        self.refresh_seconds = refresh_seconds
+        self._namespaces = set()
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+
+    def refresh(self):
+        stats = self.index.describe_index_stats()
+        namespaces = {name for name in (stats.get("namespaces") or {}) if name.startswith(UPLOAD_NAMESPACE_PREFIX)}
+        with self._lock:
+            self._namespaces = namespaces
+            self._refreshed_at = time.monotonic()
+        return namespaces
+
+    def add(self, paper_id):
+        with self._lock:
+            self._namespaces.add(paper_namespace(paper_id))
+
+    def discard(self, paper_id):
+        with self._lock:
+            self._namespaces.discard(paper_namespace(paper_id))
+
+    def lookup(self, paper_id):
+        """
+        Returns the namespace of a partitioned paper, or None for a paper in
+        the shared corpus namespace.
+        """
+        namespace = paper_namespace(paper_id)
+        with self._lock:
+            if namespace in self._namespaces:
+                return namespace
+            stale = self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.refresh_seconds
+        if stale:
+            try:
+                if namespace in self.refresh():
+                    return namespace
+            except Exception as e:
+                print(f"Could not refresh namespaces: {e}")
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"paper_namespaces": len(self._namespaces)}
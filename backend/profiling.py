@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+
+# Opt-in sampling profiler for single requests. A background thread samples
+# the stack of the request thread every interval seconds; the samples are
+# saved in the collapsed-stack format ("outer;inner;leaf count" per line)
+# read by flamegraph.pl, speedscope and inferno. Requests that are not
+# profiled never start a sampler.
+
+PROFILE_SUFFIX = ".folded"
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.folded$")
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, thread_id, interval=0.005, max_depth=128):
+        """
+        Args:
+            thread_id (int): Ident of the thread to sample.
+            interval (float): Seconds between samples.
+            max_depth (int): Innermost frames kept per sample.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """
+        Returns the samples as collapsed stacks, most frequent first.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileStore:
+    """
+    Directory of saved profiles, keeping only the newest max_files.
+    """
+
+    def __init__(self, path, max_files=200):
+        self.path = path
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def save(self, label, text):
+        """
+        Writes one profile and prunes the oldest ones.
+        Returns:
+            str: The profile name, used to download it.
+        """
+        slug = re.sub(r"[^\w-]+", "_", label).strip("_")[:80] or "request"
+        name = f"{int(time.time() * 1000)}-{slug}-{os.urandom(4).hex()}{PROFILE_SUFFIX}"
+        with open(os.path.join(self.path, name), "w") as file:
+            file.write(text)
+        with self._lock:
+            for old in self.list()[self.max_files:]:
+                try:
+                    os.remove(os.path.join(self.path, old["name"]))
+                except OSError:
+                    pass
+        return name
+
+    def list(self):
+        """
+        Returns name, size and modification time of every profile, newest first.
+        """
+        profiles = []
+        for name in os.listdir(self.path):
+            if PROFILE_NAME_PATTERN.match(name):
+                stat = os.stat(os.path.join(self.path, name))
+                profiles.append({"name": name, "bytes": stat.st_size, "created": stat.st_mtime})
+        return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
+
+    def path_for(self, name):
+        """
+        Returns the file of a profile, or None for an unknown or unsafe name.
+        """
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.path, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,179 @@
+import time
+import threading
+from collections import deque, OrderedDict
+
+from llm_limits import ProviderBusyError
+
+# Priority scheduler for LLM and embedding calls. Work is tagged with a class
+# (interactive /query, batch jobs, ingestion by /summarize) and a user. Free
+# slots go to the backlogged class with the lowest weighted virtual time, and
+# within a class to the user with the lowest virtual time, so one user's
+# upload burst cannot starve everyone else. Each class can also be capped to
+# a number of slots, so heavy ingestion never holds all of them.
+
+INTERACTIVE_WORK = "interactive"
+BATCH_WORK = "batch"
+INGESTION_WORK = "ingestion"
+
+DEFAULT_WEIGHTS = {INTERACTIVE_WORK: 8, BATCH_WORK: 2, INGESTION_WORK: 1}
+
+class SchedulerBusyError(ProviderBusyError):
+    """
+    Raised when a scheduler queue is full or a caller waited too long.
+    """
+
+class Waiter:
+    def __init__(self, work_class, user):
+        self.work_class = work_class
+        self.user = user
+        self.event = threading.Event()
+        self.granted = False
+
+class FairScheduler:
+    def __init__(self, name, slots, weights=None, caps=None, max_queue=256, timeout=60.0):
+        """
+        Args:
+            name (str): Name used in errors and stats.
+            slots (int): Calls allowed to run at once across all classes.
+            weights (dict): Work class -> share weight.
+            caps (dict): Work class -> maximum slots the class may hold.
+            max_queue (int): Maximum number of waiting calls.
+            timeout (float): Seconds a call may wait for a slot.
+        """
+        self.name = name
+        self.slots = slots
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.caps = {work_class: (caps or {}).get(work_class, slots) for work_class in self.weights}
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queues = {work_class: OrderedDict() for work_class in self.weights}
+        self._class_time = {work_class: 0.0 for work_class in self.weights}
+        self._user_time = {work_class: {} for work_class in self.weights}
+        self._running = {work_class: 0 for work_class in self.weights}
+        self._queued = 0
+        self._stats = {work_class: {"dispatched": 0, "rejected": 0, "total_wait": 0.0, "max_wait": 0.0}
+                       for work_class in self.weights}
+
+    def run(self, work_class, user, fn):
+        """
+        Runs fn once the scheduler grants a slot to (work_class, user).
+        """
+        self._acquire(work_class, user or "anonymous")
+        try:
+            return fn()
+        finally:
+            self._release(work_class)
+
+    def admit(self, work_class):
+        """
+        Raises SchedulerBusyError if a call of work_class would be rejected
+        right now, so callers can refuse work before any side effects.
+        """
+        if work_class not in self.weights:
+            raise ValueError(f"Unknown work class: {work_class}")
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats[work_class]["rejected"] += 1
+                raise SchedulerBusyError(f"{self.name} scheduler queue is full ({self.max_queue} waiting)")
+
+    def _acquire(self, work_class, user):
+        if work_class not in self.weights:
+            raise ValueError(f"Unknown work class: {work_class}")
+        start = time.perf_counter()
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats[work_class]["rejected"] += 1
+                raise SchedulerBusyError(f"{self.name} scheduler queue is full ({self.max_queue} waiting)")
+            waiter = Waiter(work_class, user)
+            self._enqueue(waiter)
+            self._dispatch()
+
+        if not waiter.event.wait(self.timeout):
+            with self._lock:
+                if not waiter.granted:
+                    self._remove(waiter)
+                    self._stats[work_class]["rejected"] += 1
+                    raise SchedulerBusyError(f"{self.name} scheduler gave no {work_class} slot within {self.timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[work_class]
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def _enqueue(self, waiter):
+        queues = self._queues[waiter.work_class]
+        user_time = self._user_time[waiter.work_class]
+        # A class or user that was idle starts at the current minimum, so idle
+        # time does not turn into a burst of saved-up credit
+        if not any(queues.values()):
+            self._class_time[waiter.work_class] = max(self._class_time[waiter.work_class], self._min_active_class_time())
+        if not queues.get(waiter.user):
+            active = [user_time[user] for user, waiters in queues.items() if waiters]
+            user_time[waiter.user] = max(user_time.get(waiter.user, 0.0), min(active) if active else 0.0)
+        queues.setdefault(waiter.user, deque()).append(waiter)
+        self._queued += 1
+
+    def _remove(self, waiter):
+        queue = self._queues[waiter.work_class].get(waiter.user)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+
+    def _min_active_class_time(self):
+        active = [self._class_time[work_class] for work_class, queues in self._queues.items() if any(queues.values())]
+        return min(active) if active else max(self._class_time.values())
+
+    def _dispatch(self):
+        """
+        Grants free slots to waiting calls; called with the lock held.
+        """
+        while sum(self._running.values()) < self.slots:
+            eligible = [
+                work_class for work_class, queues in self._queues.items()
+                if any(queues.values()) and self._running[work_class] < self.caps[work_class]
+            ]
+            if not eligible:
+                return
+            work_class = min(eligible, key=lambda name: self._class_time[name])
+            queues = self._queues[work_class]
+            user_time = self._user_time[work_class]
+            user = min((user for user, waiters in queues.items() if waiters), key=lambda name: user_time[name])
+
+            waiter = queues[user].popleft()
+            if not queues[user]:
+                del queues[user]
+            self._queued -= 1
+            self._class_time[work_class] += 1.0 / self.weights[work_class]
+            user_time[user] += 1.0
+            self._running[work_class] += 1
+            self._stats[work_class]["dispatched"] += 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def _release(self, work_class):
+        with self._lock:
+            self._running[work_class] -= 1
+            # With nobody waiting in the class, user times carry no information
+            # (idle users restart at the minimum), so drop them to stay small
+            if not any(self._queues[work_class].values()):
+                self._user_time[work_class].clear()
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            report = {"slots": self.slots, "running": sum(self._running.values()), "queued": self._queued, "classes": {}}
+            for work_class, stats in self._stats.items():
+                dispatched = stats["dispatched"]
+                report["classes"][work_class] = {
+                    "weight": self.weights[work_class],
+                    "cap": self.caps[work_class],
+                    "running": self._running[work_class],
+                    "queued": sum(len(waiters) for waiters in self._queues[work_class].values()),
+                    "dispatched": dispatched,
+                    "rejected": stats["rejected"],
+                    "avg_wait_ms": stats["total_wait"] * 1000 / dispatched if dispatched else 0.0,
+                    "max_wait_ms": stats["max_wait"] * 1000,
+                }
+            return report
@@ -0,0 +1,86 @@
+import time
+import random
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_limits import Hedger
+
+# Exercises the Hedger with fake providers that have injected delays, and
+# compares tail latency with and without hedging.
+#
+#   python simulate_hedging.py --requests 400 --cold-start-rate 0.05
+
+class FakeProvider:
+    """
+    Sleeps for a lognormal latency, with occasional cold starts and failures.
+    """
+
+    def __init__(self, name, median, cold_start_rate=0.0, cold_start=5.0, error_rate=0.0, seed=0):
+        self.name = name
+        self.median = median
+        self.cold_start_rate = cold_start_rate
+        self.cold_start = cold_start
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def __call__(self):
+        delay = self.median * self._random.lognormvariate(0, 0.3)
+        if self._random.random() < self.cold_start_rate:
+            delay += self.cold_start
+        time.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise RuntimeError(f"{self.name} failed")
+        return self.name
+
+def run(providers, requests, concurrency, hedger=None):
+    """
+    Sends requests to the "primary" provider, optionally through a Hedger.
+    Returns:
+        tuple: (latencies in seconds, results)
+    """
+    def one(_):
+        start = time.perf_counter()
+        try:
+            if hedger:
+                result = hedger.call("primary", lambda name: providers[name]())
+            else:
+                result = providers["primary"]()
+        except Exception as e:
+            result = f"error: {e}"
+        return time.perf_counter() - start, result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, range(requests)))
+    return np.array([latency for latency, _ in outcomes]), [result for _, result in outcomes]
+
+def describe(name, latencies, results):
+    errors = sum(1 for result in results if result.startswith("error"))
+    backup = sum(1 for result in results if result == "backup")
+    print(f"{name:10s} p50 {np.percentile(latencies, 50) * 1000:7.0f} ms  p95 {np.percentile(latencies, 95) * 1000:7.0f} ms  "
+          f"p99 {np.percentile(latencies, 99) * 1000:7.0f} ms  errors {errors}  served by backup {backup}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate hedged LLM requests with fake providers.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--primary-median", type=float, default=0.2)
+    parser.add_argument("--backup-median", type=float, default=0.3)
+    parser.add_argument("--cold-start-rate", type=float, default=0.05)
+    parser.add_argument("--cold-start", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--percentile", type=float, default=95)
+    args = parser.parse_args()
+
+    def providers():
+        return {
+            "primary": FakeProvider("primary", args.primary_median, args.cold_start_rate, args.cold_start, args.error_rate, seed=1),
+            "backup": FakeProvider("backup", args.backup_median, seed=2),
+        }
+
+    describe("direct", *run(providers(), args.requests, args.concurrency))
+    hedger = Hedger({"primary": "backup"}, percentile=args.percentile, default_delay=1.0, min_samples=10)
+    describe("hedged", *run(providers(), args.requests, args.concurrency, hedger))
+    stats = hedger.stats()
+    print(f"hedged {stats['hedged']} of {stats['calls']} calls, {stats['fallbacks']} fallbacks after errors, "
+          f"hedge delay {stats['hedge_delay_ms']['primary']:.0f} ms")
@@ -0,0 +1,213 @@
+import re
+import json
+import bisect
+import threading
+from array import array
+
+import numpy as np
+
+# In-memory title search over the paper metadata in pdf_metadata.json
+# (cleaned name -> [PaperID, S3 link, PDF name]). Columns are stored as flat
+# arrays: integers in array("q"), strings as one utf-8 buffer plus offsets.
+# Two indexes sit on top: a sorted word list for prefix autocomplete and
+# trigram posting lists for typo-tolerant search.
+
+class StringColumn:
+    """
+    Append-only column of strings packed into one buffer.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("I", [0])
+
+    def append(self, value):
+        self._data += value.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def __getitem__(self, row):
+        return self._data[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def nbytes(self):
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+def normalize_title(text):
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+def title_trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def display_title(pdf_name):
+    title = re.sub(r"\.pdf$", "", pdf_name, flags=re.I)
+    return re.sub(r"_\s", ": ", title).replace("_", " ").strip()
+
+class TitleIndex:
+    def __init__(self):
+        self.paper_ids = array("q")
+        self.titles = StringColumn()
+        self.links = StringColumn()
+        self.pdf_names = StringColumn()
+        self.keys = StringColumn()
+        self.gram_counts = array("I")
+        self.key_lengths = array("I")
+        self._rows_by_paper = {}
+        self._keys = []
+        self._key_rows = array("I")
+        self._words = []
+        self._word_rows = array("I")
+        self._postings = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_metadata_file(cls, path):
+        with open(path, "r") as file:
+            pdf_metadata = json.load(file)
+        title_index = cls()
+        title_index.add_many((metadata[0], metadata[1], metadata[2]) for metadata in pdf_metadata.values())
+        return title_index
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def add(self, paper_id, link, pdf_name):
+        """
+        Adds (or, for a known PaperID, ignores) one paper.
+        """
+        with self._lock:
+            row = self._append_row(paper_id, link, pdf_name)
+            if row is None:
+                return
+            key = self.keys[row]
+            position = bisect.bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._key_rows.insert(position, row)
+            for word in set(key.split()):
+                position = bisect.bisect_left(self._words, word)
+                self._words.insert(position, word)
+                self._word_rows.insert(position, row)
+
+    def add_many(self, papers):
+        """
+        Adds (PaperID, link, PDF name) tuples, sorting the word index once.
+        """
+        with self._lock:
+            entries = list(zip(self._words, self._word_rows))
+            keys = list(zip(self._keys, self._key_rows))
+            for paper_id, link, pdf_name in papers:
+                row = self._append_row(paper_id, link, pdf_name)
+                if row is not None:
+                    keys.append((self.keys[row], row))
+                    entries.extend((word, row) for word in set(self.keys[row].split()))
+            entries.sort()
+            keys.sort()
+            self._words = [word for word, _ in entries]
+            self._word_rows = array("I", (row for _, row in entries))
+            self._keys = [key for key, _ in keys]
+            self._key_rows = array("I", (row for _, row in keys))
+
+    def _append_row(self, paper_id, link, pdf_name):
+        """
+        Appends a paper to the columns and trigram postings; called with the
+        lock held.
+        Returns:
+            int: The new row, or None if the PaperID is already indexed.
+        """
+        paper_id = int(paper_id)
+        if paper_id in self._rows_by_paper:
+            return None
+        title = display_title(pdf_name)
+        key = normalize_title(title)
+        row = len(self.paper_ids)
+        self.paper_ids.append(paper_id)
+        self.titles.append(title)
+        self.links.append(link or "")
+        self.pdf_names.append(pdf_name)
+        self.keys.append(key)
+        self.key_lengths.append(len(key))
+        self._rows_by_paper[paper_id] = row
+
+        grams = title_trigrams(key)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, array("I")).append(row)
+        return row
+
+    def _result(self, row, score):
+        return {
+            "PaperID": self.paper_ids[row],
+            "title": self.titles[row],
+            "PaperLink": self.links[row],
+            "PaperPDFName": self.pdf_names[row],
+            "score": round(float(score), 4),
+        }
+
+    def search(self, query, limit=10, min_score=0.2):
+        """
+        Ranks titles by trigram similarity to the query, with titles starting
+        with the query first.
+        """
+        key = normalize_title(query)
+        if not key:
+            return []
+        grams = title_trigrams(key)
+        with self._lock:
+            lists = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not lists:
+                return []
+            rows = np.concatenate([np.frombuffer(postings, dtype=np.uint32) for postings in lists])
+            shared = np.bincount(rows, minlength=len(self.paper_ids)).astype(np.float32)
+            totals = np.frombuffer(self.gram_counts, dtype=np.uint32).astype(np.float32)
+            scores = shared / (len(grams) + totals - shared)
+            candidates = np.flatnonzero(scores >= min_score)
+            if not len(candidates):
+                return []
+            # Titles starting with the query rank high on trigrams already, so
+            # the prefix boost is only checked for the best few
+            if len(candidates) > limit * 4:
+                candidates = candidates[np.argpartition(-scores[candidates], limit * 4)[:limit * 4]]
+            boosted = scores[candidates] + np.array([self.keys[row].startswith(key) for row in candidates], dtype=np.float32)
+            top = candidates[np.argsort(-boosted, kind="stable")[:limit]]
+            return [self._result(row, scores[row]) for row in top]
+
+    def autocomplete(self, prefix, limit=8):
+        """
+        Completes the last word of the prefix; every earlier word must appear
+        in the title. Titles starting with the prefix come first, then shorter
+        titles.
+        """
+        words = normalize_title(prefix).split()
+        if not words:
+            return []
+        full_prefix = " ".join(words)
+        *complete, partial = words
+        with self._lock:
+            leading = self._prefix_range(self._keys, self._key_rows, full_prefix)
+            rows = self._prefix_range(self._words, self._word_rows, partial)
+            for word in complete:
+                start = bisect.bisect_left(self._words, word)
+                rows &= set(self._word_rows[start:bisect.bisect_right(self._words, word)])
+            ordered = sorted(leading, key=lambda row: self.key_lengths[row])
+            if len(ordered) < limit:
+                ordered += sorted(rows - leading, key=lambda row: self.key_lengths[row])
+            return [self._result(row, 1.0) for row in ordered[:limit]]
+
+    @staticmethod
+    def _prefix_range(sorted_values, rows, prefix):
+        start = bisect.bisect_left(sorted_values, prefix)
+        return set(rows[start:bisect.bisect_left(sorted_values, prefix + "\uffff")])
+
+    def stats(self):
+        with self._lock:
+            column_bytes = (self.paper_ids.itemsize * len(self.paper_ids)
+                            + sum(column.nbytes() for column in (self.titles, self.links, self.pdf_names, self.keys)))
+            return {
+                "papers": len(self.paper_ids),
+                "words": len(self._words),
+                "trigrams": len(self._postings),
+                "column_bytes": column_bytes,
+                "posting_bytes": sum(postings.itemsize * len(postings) for postings in self._postings.values()),
+            }
@@ -0,0 +1,217 @@
+import os
+import json
+import numpy as np
+
+# Local vector search over the chunk embeddings. Full-precision vectors live in
+# a memory-mapped float32 file; only compact codes (int8 or 1 bit per
+# dimension) are held in memory for the first pass, and the best candidates
+# are rescored exactly against the memory-mapped vectors.
+
+STORE_MODES = ("float32", "int8", "binary")
+
+# Rows of int8 codes widened to float32 at a time in the first pass, so the
+# temporary copy stays small (512 x 1536 floats = 3 MB)
+INT8_BLOCK_SIZE = 512
+
+# Number of set bits for every byte value, used for Hamming distances
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-vector int8 quantization.
+    Returns:
+        tuple: (int8 codes, float32 scale per vector)
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+def quantize_binary(vectors):
+    """
+    Sign quantization, packed to 1 bit per dimension and padded to whole
+    64-bit words.
+    """
+    bits = np.packbits(vectors > 0, axis=1)
+    padding = -bits.shape[1] % 8
+    if padding:
+        bits = np.pad(bits, ((0, 0), (0, padding)))
+    return bits
+
+def hamming_distances(codes, query_bits):
+    """
+    Hamming distances between packed codes and a packed query.
+    """
+    if hasattr(np, "bitwise_count"):
+        # numpy >= 2.0 has a native popcount
+        return np.bitwise_count(np.bitwise_xor(codes.view(np.uint64), query_bits.view(np.uint64))).sum(axis=1, dtype=np.int32)
+    return POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+def paper_number(vector_id):
+    # Vector ids look like "paper_12#chunk_3"
+    return int(vector_id.split("#")[0].split("_")[1])
+
+class QuantizedVectorStore:
+    """
+    Cosine-similarity search with quantized first-pass codes and exact rerank.
+    """
+
+    def __init__(self, ids, vectors, mode="int8", rerank_factor=10, block_size=4096):
+        """
+        Args:
+            ids (list): Vector ids, row aligned with vectors.
+            vectors (np.ndarray): Normalised float32 vectors, usually a memmap.
+            mode (str): One of STORE_MODES.
+            rerank_factor (int): Candidates rescored per requested result.
+            block_size (int): Rows scored per block in the first pass.
+        """
+        if mode not in STORE_MODES:
+            raise ValueError(f"Unknown vector store mode: {mode}")
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.mode = mode
+        self.rerank_factor = rerank_factor
+        self.block_size = block_size
+        self.papers = np.array([paper_number(vector_id) for vector_id in self.ids], dtype=np.int64)
+
+        self.codes = None
+        self.scales = None
+        if mode == "int8":
+            self.codes, self.scales = self._quantize_blocks(quantize_int8)
+        elif mode == "binary":
+            self.codes = self._quantize_blocks(quantize_binary)
+
+    def _quantize_blocks(self, quantize):
+        parts = [quantize(np.asarray(self.vectors[i:i + self.block_size]))
+                 for i in range(0, len(self.ids), self.block_size)]
+        if isinstance(parts[0], tuple):
+            return tuple(np.concatenate(column) for column in zip(*parts))
+        return np.concatenate(parts)
+
+    @classmethod
+    def build(cls, ids, vectors, path, mode="int8", **kwargs):
+        """
+        Writes ids and normalised vectors to path and opens a store over them.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), normalize(vectors))
+        with open(os.path.join(path, "ids.json"), "w") as file:
+            json.dump(list(ids), file)
+        return cls.load(path, mode, **kwargs)
+
+    @classmethod
+    def load(cls, path, mode="int8", **kwargs):
+        with open(os.path.join(path, "ids.json"), "r") as file:
+            ids = json.load(file)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        return cls(ids, vectors, mode, **kwargs)
+
+    def memory_bytes(self):
+        """
+        Resident bytes of the in-memory search structures; the memory-mapped
+        full-precision vectors are only counted in float32 mode, where every
+        query reads all of them.
+        """
+        total = self.papers.nbytes
+        if self.mode == "float32":
+            total += self.vectors.nbytes
+        if self.codes is not None:
+            total += self.codes.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    def _approximate_scores(self, queries, rows=None):
+        """
+        First-pass scores of the given rows (all rows if None) against a
+        matrix of queries, computed in blocks so temporary float copies stay
+        bounded.
+        Returns:
+            np.ndarray: Scores of shape (queries, rows).
+        """
+        count = len(self.ids) if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        if self.mode == "binary":
+            query_bits = quantize_binary(queries)
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            block = slice(start, end) if rows is None else rows[start:end]
+            if self.mode == "float32":
+                scores[:, start:end] = queries @ np.asarray(self.vectors[block]).T
+            elif self.mode == "int8":
+                # numpy has no fast integer matmul, so codes are widened to
+                # float32 (BLAS) in small sub-blocks
+                for sub in range(start, end, INT8_BLOCK_SIZE):
+                    sub_end = min(sub + INT8_BLOCK_SIZE, end)
+                    sub_block = slice(sub, sub_end) if rows is None else rows[sub:sub_end]
+                    scores[:, sub:sub_end] = (queries @ self.codes[sub_block].astype(np.float32).T) * self.scales[sub_block]
+            else:
+                codes = self.codes[block]
+                for column, bits in enumerate(query_bits):
+                    # Higher is better, so use minus the Hamming distance
+                    scores[column, start:end] = -hamming_distances(codes, bits)
+        return scores
+
+    def search_batch(self, queries, top_k=10, paper_ids=None):
+        """
+        Finds the top_k most similar vectors for every query at once: one
+        score matrix, one top-k selection along the rows and one batched
+        exact rerank.
+        Args:
+            queries (list): Query embeddings.
+            top_k (int): Number of results per query.
+            paper_ids (list): Restrict results to these paper numbers.
+        Returns:
+            List (one per query) of (id, cosine score) tuples, best first.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        if paper_ids is not None:
+            rows = np.flatnonzero(np.isin(self.papers, np.asarray(paper_ids, dtype=np.int64)))
+            scores = self._approximate_scores(queries, rows)
+        else:
+            rows = np.arange(len(self.ids))
+            scores = self._approximate_scores(queries)
+        if rows.size == 0:
+            return [[] for _ in queries]
+
+        # (queries, candidates) row numbers and scores
+        if self.mode == "float32":
+            candidate_rows = np.broadcast_to(rows, (len(queries), rows.size))
+            candidate_scores = scores
+        else:
+            candidates = min(rows.size, top_k * self.rerank_factor)
+            keep = np.argpartition(-scores, candidates - 1, axis=1)[:, :candidates]
+            candidate_rows = rows[keep]
+            # Exact rescoring reads only the candidate rows from the memmap
+            unique_rows, inverse = np.unique(candidate_rows, return_inverse=True)
+            exact = np.asarray(self.vectors[unique_rows]) @ queries.T
+            candidate_scores = exact[inverse.reshape(candidate_rows.shape), np.arange(len(queries))[:, None]]
+
+        top_k = min(top_k, rows.size)
+        best = np.argpartition(-candidate_scores, top_k - 1, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(candidate_scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(candidate_rows, best, axis=1)
+        return [
+            [(self.ids[row], float(score)) for row, score in zip(query_rows, query_scores)]
+            for query_rows, query_scores in zip(best_rows, best_scores)
+        ]
+
+    def search(self, query, top_k=10, paper_ids=None):
+        """
+        Finds the top_k most similar vectors to the query.
+        Args:
+            query (list): Query embedding.
+            top_k (int): Number of results.
+            paper_ids (list): Restrict results to these paper numbers.
+        Returns:
+            List of (id, cosine score) tuples, best first.
+        """
+        return self.search_batch([query], top_k, paper_ids)[0]
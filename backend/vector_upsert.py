@@ -0,0 +1,124 @@
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Parallel, size-aware upserts into a Pinecone index. Vectors are packed into
+# batches by their serialized size rather than a fixed count, several batches
+# are kept in flight at once, and failed batches are retried with backoff.
+
+MAX_REQUEST_BYTES = 2 * 1024 * 1024  # Pinecone's upsert request limit
+MAX_REQUEST_VECTORS = 1000
+REQUEST_OVERHEAD_BYTES = 64  # {"vectors":[...],"namespace":"..."}
+
+def vector_bytes(vector):
+    """
+    Returns the JSON-serialized size of one vector record, an upper bound for
+    the gRPC encoding and what the REST client actually sends.
+    """
+    return len(json.dumps(vector, separators=(",", ":")))
+
+def iter_batches(vectors, max_batch_bytes=MAX_REQUEST_BYTES, max_batch_vectors=MAX_REQUEST_VECTORS):
+    """
+    Packs a stream of vector records into batches below both limits.
+    Yields:
+        tuple: (list of records, serialized bytes of the batch)
+    """
+    budget = max_batch_bytes - REQUEST_OVERHEAD_BYTES
+    batch, batch_bytes = [], 0
+    for vector in vectors:
+        size = vector_bytes(vector) + 1  # separating comma
+        if size > budget:
+            raise ValueError(f"Vector {vector.get('id')} is {size} bytes, above the {max_batch_bytes} byte request limit")
+        if batch and (batch_bytes + size > budget or len(batch) >= max_batch_vectors):
+            yield batch, batch_bytes
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch, batch_bytes
+
+def is_retryable(error):
+    """
+    Client errors other than throttling will fail again, so only those are
+    not retried.
+    """
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+class ParallelUpserter:
+    def __init__(self, index, max_batch_bytes=MAX_REQUEST_BYTES, max_batch_vectors=MAX_REQUEST_VECTORS,
+                 max_in_flight=4, max_retries=5, backoff=0.5, max_backoff=20.0, namespace=None):
+        """
+        Args:
+            index: Pinecone index (anything with upsert(vectors=...)).
+            max_batch_bytes (int): Serialized size limit of one request.
+            max_batch_vectors (int): Vector count limit of one request.
+            max_in_flight (int): Batches sent concurrently.
+            max_retries (int): Retries of a failed batch before giving up.
+            backoff (float): First retry delay in seconds, doubled per attempt.
+            max_backoff (float): Upper bound of the retry delay.
+            namespace (str): Namespace to upsert into, the default one if None.
+        """
+        self.index = index
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_vectors = max_batch_vectors
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.namespace = namespace
+
+    def _send(self, batch):
+        """
+        Sends one batch with retries.
+        Returns:
+            tuple: (vectors upserted, retries needed)
+        """
+        kwargs = {"namespace": self.namespace} if self.namespace else {}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=batch, **kwargs)
+                return len(batch), attempt
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter, so parallel batches do not retry in lockstep
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                print(f"Upsert of {len(batch)} vectors failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _collect(self, future, stats):
+        count, retries = future.result()
+        stats["vectors"] += count
+        stats["retries"] += retries
+
+    def upsert(self, vectors):
+        """
+        Upserts a list or stream of vector records. At most max_in_flight
+        batches are buffered, so a generator is consumed as batches complete.
+        Returns:
+            dict: Vectors, batches, bytes, retries, seconds and vectors_per_sec.
+        """
+        stats = {"vectors": 0, "batches": 0, "bytes": 0, "retries": 0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="upsert") as executor:
+            pending = set()
+            try:
+                for batch, batch_bytes in iter_batches(vectors, self.max_batch_bytes, self.max_batch_vectors):
+                    if len(pending) >= self.max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._collect(future, stats)
+                    pending.add(executor.submit(self._send, batch))
+                    stats["batches"] += 1
+                    stats["bytes"] += batch_bytes
+                for future in pending:
+                    self._collect(future, stats)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        stats["seconds"] = time.perf_counter() - start
+        stats["vectors_per_sec"] = stats["vectors"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
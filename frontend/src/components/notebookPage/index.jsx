@@ -140,6 +140,7 @@ const NotebookInterface = () => {
         file_id: selectedSource.id, // Use the file ID
         query: message[message.length - 1]["message"],
         model: selectedModel, // Use the selected model
+        fields: ["answer"], // Only the answer is shown in the chat
       };
 
       const response = await fetch(
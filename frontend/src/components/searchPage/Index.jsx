@@ -41,6 +41,7 @@ const SearchingComponent = () => {
       const payload = {
         query: searchText,
         model: selectedModel, // Use the selected model
+        fields: ["answer", "papers"], // Only what this page renders
       };
       const response = await fetch(
         "https://research-llm-backend-316797979759.us-east4.run.app/query",
@@ -59,7 +60,7 @@ const SearchingComponent = () => {
 
       const data = await response.json();
       setResultText(data.answer || "No results found.");
-      setDynamoData(data.dynamo_data || []); // Extract and set dynamo_data
+      setDynamoData(data.papers || []); // Paper cards for the results
       setIsLoading(false);
     } catch (error) {
       setResultText(`Error: ${error.message}`);
@@ -0,0 +1,59 @@
+import os
+import json
+import time
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Backend that serves /getSummary, e.g. http://localhost:5050
+BACKEND_DOMAIN = os.getenv("BACKEND_DOMAIN", "http://localhost:5050")
+
+def summarize_paper(paper_id, model=None):
+    """
+    Asks the backend for a paper's summary, generating and caching it on a miss.
+    Args:
+        paper_id (int): PaperID of the paper.
+        model (str): Optional summary model override.
+    Returns:
+        tuple: (paper_id, error message or None)
+    """
+    payload = {"PaperID": paper_id, "generate": True}
+    if model:
+        payload["model"] = model
+    try:
+        response = requests.post(f"{BACKEND_DOMAIN}/getSummary", json=payload, timeout=600)
+        if response.status_code != 200:
+            return paper_id, response.text
+        return paper_id, None
+    except Exception as e:
+        return paper_id, str(e)
+
+def presummarize(metadata_path, workers=4, model=None):
+    """
+    Pre-summarizes every paper listed in pdf_metadata.json in the background,
+    so later /getSummary calls are served from the cache.
+    """
+    with open(metadata_path, "r") as file:
+        pdf_metadata = json.load(file)
+    paper_ids = sorted(metadata[0] for metadata in pdf_metadata.values())
+
+    start = time.time()
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(summarize_paper, paper_id, model) for paper_id in paper_ids]
+        for done, future in enumerate(as_completed(futures), 1):
+            paper_id, error = future.result()
+            if error:
+                failures += 1
+                print(f"Error summarizing paper {paper_id}: {error}")
+            if done % 50 == 0:
+                print(f"{done}/{len(paper_ids)} papers done in {time.time() - start:.1f}s")
+    print(f"Summarized {len(paper_ids) - failures}/{len(paper_ids)} papers in {time.time() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the summary cache for the paper corpus.")
+    parser.add_argument("--metadata", default="pdf_metadata.json")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+    presummarize(args.metadata, args.workers, args.model)